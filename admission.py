@@ -0,0 +1,193 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+# Lower number = served first. Interactive chat beats quiz generation,
+# and background memory summarization only gets leftover capacity.
+PRIORITIES = {"chat": 0, "quiz": 1, "summarize": 2}
+BACKGROUND = {"summarize"}       # never rejected: they wait their turn
+MAX_QUEUE = 64                   # interactive requests waiting for the LLM
+MAX_QUEUED_PER_SESSION = 2       # one user can't fill the queue
+MAX_QUEUE_WAIT = 30.0            # seconds; also used to reject up front
+SERVICE_TIME_GUESS = 5.0         # seconds per generation until measured
+SERVICE_TIME_ALPHA = 0.2         # EWMA weight of the newest generation
+STARVATION_GRANTS = 8            # a waiting class passed over this many times goes next
+
+
+class Overloaded(Exception):
+    """The LLM queue can't take this request; maps to 429/503 + Retry-After."""
+
+    def __init__(self, reason, status_code, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# ============================================================
+# 🚦 Admission Control
+# ============================================================
+class AdmissionController:
+    """Bounded pool of LLM slots with a fair, prioritized wait queue.
+
+    At most `capacity` generations run at once. Waiters are kept per
+    priority class and, within a class, per session; slots go to the
+    highest class first and round-robin across its sessions, so one
+    chatty client cannot starve the others. A lower class that has been
+    passed over `starvation_grants` times in a row is served next, so
+    background summaries still get about one slot in that many under
+    steady chat load. Interactive requests are
+    refused straight away (429 when their session already has
+    `max_per_session` queued, 503 when the queue is full or the
+    estimated wait exceeds `max_wait`) rather than timing out late.
+    """
+
+    def __init__(self, capacity, max_queue=MAX_QUEUE, max_per_session=MAX_QUEUED_PER_SESSION,
+                 max_wait=MAX_QUEUE_WAIT, starvation_grants=STARVATION_GRANTS):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.max_wait = max_wait
+        self.starvation_grants = starvation_grants
+        self.active = 0
+        self.queues = {p: OrderedDict() for p in sorted(set(PRIORITIES.values()))}
+        self.passed_over = {p: 0 for p in self.queues}   # grants to higher classes while waiting
+        self.queued = 0
+        self.service_time = SERVICE_TIME_GUESS
+        self.admitted = {kind: 0 for kind in PRIORITIES}
+        self.rejected = {"session_limit": 0, "queue_full": 0, "wait_too_long": 0, "timed_out": 0}
+
+    def queued_for(self, session_id):
+        return sum(len(q.get(session_id, ())) for q in self.queues.values())
+
+    def ahead_of(self, priority):
+        return sum(sum(len(w) for w in q.values()) for p, q in self.queues.items() if p <= priority)
+
+    def estimated_wait(self, position):
+        # Whole "rounds" of the pool that have to finish before our turn
+        return math.ceil(position / self.capacity) * self.service_time
+
+    def retry_after(self):
+        return max(1, math.ceil(self.estimated_wait(self.queued + 1)))
+
+    def _reject(self, reason, status_code):
+        self.rejected[reason] += 1
+        raise Overloaded(reason, status_code, self.retry_after())
+
+    def check(self, session_id, kind="chat"):
+        """Raise Overloaded now if acquire() would refuse this request.
+
+        Cheap enough to call before doing any work for a request.
+        """
+        priority = PRIORITIES[kind]
+        if kind in BACKGROUND or (self.active < self.capacity and not self.queued):
+            return
+        if self.queued_for(session_id) >= self.max_per_session:
+            self._reject("session_limit", 429)
+        interactive = sum(sum(len(w) for w in self.queues[PRIORITIES[k]].values())
+                          for k in PRIORITIES if k not in BACKGROUND)
+        if interactive >= self.max_queue:
+            self._reject("queue_full", 503)
+        if self.estimated_wait(self.ahead_of(priority) + 1) > self.max_wait:
+            self._reject("wait_too_long", 503)
+
+    async def acquire(self, session_id, kind="chat"):
+        priority = PRIORITIES[kind]
+        if self.active < self.capacity and not self.queued:
+            self.active += 1
+            self.admitted[kind] += 1
+            return
+        self.check(session_id, kind)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(session_id, deque()).append(waiter)
+        self.queued += 1
+        timeout = None if kind in BACKGROUND else self.max_wait
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # granted just as we gave up: hand the slot on
+            else:
+                waiter.cancel()
+                self._remove(priority, session_id, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("timed_out", 503)
+            raise
+        self.admitted[kind] += 1
+
+    def _remove(self, priority, session_id, waiter):
+        waiters = self.queues[priority].get(session_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self.queues[priority][session_id]
+
+    def release(self, service_seconds=None):
+        if service_seconds is not None:
+            self.service_time += SERVICE_TIME_ALPHA * (service_seconds - self.service_time)
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.active < self.capacity and self.queued:
+            waiting = [p for p, sessions in self.queues.items() if sessions]
+            # Aging: a class passed over too often goes first, else strict priority
+            starved = [p for p in waiting if self.passed_over[p] >= self.starvation_grants]
+            priority = starved[0] if starved else waiting[0]
+            for p in self.queues:
+                if p == priority or p not in waiting:
+                    self.passed_over[p] = 0
+                elif p > priority:
+                    self.passed_over[p] += 1
+            sessions = self.queues[priority]
+            # Round-robin: the session at the front gets one slot, then goes to the back
+            session_id, waiters = next(iter(sessions.items()))
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                sessions.move_to_end(session_id)
+            else:
+                del sessions[session_id]
+            self.active += 1
+            waiter.set_result(True)
+
+    def slot(self, session_id, kind="chat"):
+        return _Slot(self, session_id, kind)
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "queued": self.queued,
+            "queued_by_kind": {kind: sum(len(w) for w in self.queues[p].values())
+                               for kind, p in PRIORITIES.items()},
+            "service_time": round(self.service_time, 3),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
+
+
+class _Slot:
+    """`async with admission.slot(session, kind):` holds one LLM slot."""
+
+    def __init__(self, controller, session_id, kind):
+        self.controller = controller
+        self.session_id = session_id
+        self.kind = kind
+        self.started = None
+
+    async def __aenter__(self):
+        await self.controller.acquire(self.session_id, self.kind)
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Only completed generations feed the service-time estimate
+        seconds = time.perf_counter() - self.started if exc_type is None else None
+        self.controller.release(seconds)
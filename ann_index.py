@@ -0,0 +1,211 @@
+import argparse
+import os
+
+import numpy as np
+
+from retrieval_index import normalize_rows, top_k_indices
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+ANN_FILE = "ivf.npz"
+NPROBE = 8                 # lists scanned per query: the recall-vs-latency knob
+MIN_ROWS_FOR_ANN = 20000   # below this, exact search is already fast enough
+KMEANS_ITERS = 20
+TRAIN_POINTS_PER_LIST = 64
+ASSIGN_BLOCK = 65536
+
+
+def default_n_lists(n_rows):
+    return max(1, int(4 * np.sqrt(n_rows)))
+
+
+# ============================================================
+# 🎯 Spherical k-means (coarse quantizer)
+# ============================================================
+def _assign(vectors, centroids, first=0):
+    # Labels of rows first..len(vectors), one bounded block at a time
+    labels = np.empty(len(vectors) - first, dtype=np.int32)
+    for start in range(first, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+        labels[start - first:start - first + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(vectors, n_lists, iters=KMEANS_ITERS, seed=0):
+    rng = np.random.default_rng(seed)
+    n_train = min(len(vectors), n_lists * TRAIN_POINTS_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), n_train, replace=False))],
+                        dtype=np.float32)
+    centroids = sample[rng.choice(n_train, n_lists, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=n_lists)
+        filled = counts > 0
+        starts = (np.cumsum(counts) - counts)[filled]
+        sums = np.empty_like(centroids)
+        sums[filled] = np.add.reduceat(sample[np.argsort(labels, kind="stable")], starts, axis=0)
+        # Re-seed empty lists from random points so no list is wasted
+        sums[~filled] = sample[rng.choice(n_train, int((~filled).sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+# ============================================================
+# 🗂️ IVF Index
+# ============================================================
+class IVFIndex:
+    """Inverted-file ANN index over an L2-normalized matrix.
+
+    Rows are bucketed by their nearest centroid and stored CSR-style:
+    `order` holds row ids grouped by list, `offsets[l]:offsets[l + 1]`
+    slices list l. A query scores the centroids, scans the `nprobe` best
+    lists exactly and returns their top-k, so raising nprobe trades
+    latency for recall (nprobe == n_lists is exact search).
+
+    `segments` names the store segments the rows came from, so rows
+    appended later can be added with extend() instead of retraining.
+    """
+
+    def __init__(self, centroids, order, offsets, store_version=None, nprobe=NPROBE, segments=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.order = order
+        self.offsets = offsets
+        self.store_version = store_version
+        self.nprobe = nprobe
+        self.segments = segments
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def n_rows(self):
+        return int(self.offsets[-1])
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, store_version=None, seed=0, segments=None):
+        n_lists = min(n_lists or default_n_lists(len(matrix)), len(matrix))
+        centroids = train_centroids(matrix, n_lists, seed=seed)
+        labels = _assign(matrix, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, order, offsets, store_version, segments=segments)
+
+    def extend(self, matrix, store_version=None, segments=None):
+        """Add rows n_rows..len(matrix) to their nearest existing list (no retraining)."""
+        added = _assign(matrix, self.centroids, self.n_rows)
+        labels = np.concatenate([np.repeat(np.arange(self.n_lists, dtype=np.int32), np.diff(self.offsets)), added])
+        rows = np.concatenate([self.order, np.arange(self.n_rows, len(matrix), dtype=np.int64)])
+        # Stable: old rows keep their place, new ones follow in row order
+        self.order = rows[np.argsort(labels, kind="stable")]
+        self.offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=self.n_lists), out=self.offsets[1:])
+        self.store_version = store_version
+        self.segments = segments
+        return len(added)
+
+    def candidates(self, query, nprobe=None):
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        lists = top_k_indices(self.centroids @ query, nprobe)
+        rows = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        # Sorted row ids turn the gather below into mostly sequential reads
+        rows.sort()
+        return rows
+
+    def search(self, matrix, query, top_k=5, nprobe=None, live=None):
+        rows = self.candidates(query, nprobe)
+        if live is not None:
+            rows = rows[live[rows]]  # deleted rows stay listed until compaction
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        scores = matrix[rows] @ query
+        idx = top_k_indices(scores, top_k)
+        return rows[idx], scores[idx]
+
+    # --------------------------
+    # 💾 Persistence (next to the vector store)
+    # --------------------------
+    def save(self, store_path):
+        path = os.path.join(store_path, ANN_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                     store_version=np.int64(-1 if self.store_version is None else self.store_version),
+                     segments=np.array(self.segments or [], dtype=str))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, store_path):
+        path = os.path.join(store_path, ANN_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            version = int(data["store_version"])
+            # Files written before segments were recorded can only be rebuilt
+            segments = data["segments"].tolist() if "segments" in data.files else None
+            return cls(data["centroids"], data["order"], data["offsets"],
+                       None if version < 0 else version, segments=segments)
+
+
+def load_ann(store_path, manifest, n_rows):
+    """Load the persisted IVF index if it matches the current store.
+
+    Returns None (exact search) for small corpora or a missing/stale index.
+    """
+    if n_rows < MIN_ROWS_FOR_ANN:
+        return None
+    ann = IVFIndex.load(store_path)
+    if ann is None:
+        return None
+    if ann.store_version != manifest["version"] or ann.n_rows != n_rows:
+        print("⚠️ ANN index is stale — using exact search (rebuild with `python ann_index.py`)")
+        return None
+    return ann
+
+
+def build_for_store(store_path, n_lists=None):
+    from vector_store import load_store, segment_names, store_lock
+
+    with store_lock(store_path):
+        vectors, _, manifest = load_store(store_path)
+        ann = IVFIndex.build(vectors, n_lists, store_version=manifest["version"],
+                             segments=segment_names(manifest))
+        ann.save(store_path)
+    return ann
+
+
+def update_for_store(store_path, retrain=False):
+    """Bring the persisted IVF index up to the current store version.
+
+    If the store only gained segments since the index was saved (an
+    incremental ingest or an upload), the new rows are assigned to the
+    existing centroids. A rewritten or compacted store, an index without
+    segment names, or `retrain` trains from scratch. Returns (index, rows
+    added), with rows added None after retraining.
+    """
+    from vector_store import load_store, only_appended, segment_names, store_lock
+
+    with store_lock(store_path):
+        vectors, _, manifest = load_store(store_path)
+        ann = None if retrain else IVFIndex.load(store_path)
+        names = segment_names(manifest)
+        if ann is not None and only_appended(manifest, ann.segments, ann.n_rows):
+            added = ann.extend(vectors, store_version=manifest["version"], segments=names)
+            ann.save(store_path)
+            return ann, added
+        ann = IVFIndex.build(vectors, store_version=manifest["version"], segments=names)
+        ann.save(store_path)
+    return ann, None
+
+
+if __name__ == "__main__":
+    from vector_store import STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Build the IVF ANN index for a vector store")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--lists", type=int, default=None, help="number of IVF lists (default 4*sqrt(n))")
+    args = parser.parse_args()
+    ann = build_for_store(args.store, args.lists)
+    print(f"✅ Built IVF index: {ann.n_rows} rows in {ann.n_lists} lists ({args.store}/{ANN_FILE})")
@@ -0,0 +1,119 @@
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from retrieval_index import normalize_rows
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+ANSWER_CACHE_THRESHOLD = 0.95   # cosine similarity between questions
+ANSWER_CACHE_ENTRIES = 1024
+ANSWER_CACHE_TTL = 6 * 3600     # seconds
+
+
+def context_key(mode, chunks):
+    """Identity of what the answer was generated from (prompt mode + context)."""
+    digest = hashlib.sha256(mode.encode("utf-8"))
+    for chunk in chunks:
+        digest.update(b"\0" + chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ============================================================
+# 💡 Semantic Answer Cache
+# ============================================================
+class SemanticAnswerCache:
+    """Reuse answers for near-duplicate questions over the same context.
+
+    Entries hold the normalized question embedding (already computed for
+    retrieval), a key of the retrieved context, and the answer. A lookup
+    is one small matrix-vector product over the cached questions; a hit
+    needs similarity >= threshold *and* an identical context key. Entries
+    expire after `ttl` seconds, the least recently used entry is evicted
+    when full, and everything is dropped when the index version changes.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, max_entries=ANSWER_CACHE_ENTRIES,
+                 ttl=ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.vectors = None                 # (max_entries, dim), allocated on first store
+        self.entries = OrderedDict()        # slot -> (context_key, answer, expires_at)
+        self.free = list(range(max_entries))
+        self.index_version = None
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def clear(self):
+        self.entries.clear()
+        self.free = list(range(self.max_entries))
+
+    def set_index_version(self, version):
+        """Drop every cached answer if the retrieval index changed."""
+        if version != self.index_version:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.index_version = version
+
+    def _drop(self, slot):
+        del self.entries[slot]
+        self.free.append(slot)
+
+    def lookup(self, query_embedding, key):
+        if not self.entries or self.vectors is None:
+            self.misses += 1
+            return None
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        if query.shape[-1] != self.vectors.shape[1]:
+            self.misses += 1
+            return None
+        slots = np.fromiter(self.entries.keys(), dtype=np.int64, count=len(self.entries))
+        sims = self.vectors[slots] @ query
+        now = time.time()
+        for i in np.argsort(-sims):
+            if sims[i] < self.threshold:
+                break
+            slot = int(slots[i])
+            entry_key, answer, expires_at = self.entries[slot]
+            if expires_at < now:
+                self._drop(slot)
+                continue
+            if entry_key == key:
+                self.entries.move_to_end(slot)
+                self.hits += 1
+                return answer
+        self.misses += 1
+        return None
+
+    def store(self, query_embedding, key, answer):
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        if self.vectors is None or self.vectors.shape[1] != query.shape[-1]:
+            self.vectors = np.zeros((self.max_entries, query.shape[-1]), dtype=np.float32)
+            self.clear()
+        if not self.free:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.evictions += 1
+        slot = self.free.pop()
+        self.vectors[slot] = query
+        self.entries[slot] = (key, answer, time.time() + self.ttl)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
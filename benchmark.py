@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+import ann_index
+import lexical_index
+import quantization
+from fake_ollama import ANSWER_TOKENS, EMBED_DIM, LATENCY, TOKEN_RATE, FakeOllama
+from retrieval_index import RetrievalIndex
+from vector_store import StoreWriter, read_manifest, store_exists
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+BENCH_DIR = "bench_data"
+SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = 200
+BATCH_QUERIES = 256
+TOP_K = 5
+WRITE_BLOCK = 16384
+CHAT_CORPUS = 10_000
+CHAT_REQUESTS = 200
+CHAT_CONCURRENCY = 16
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def summarize_ms(samples):
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "mean": round(float(ms.mean()), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+# ============================================================
+# 🧪 Synthetic Corpora
+# ============================================================
+def make_corpus(path, n_rows, dim=EMBED_DIM, seed=0):
+    """Write a store of `n_rows` random unit vectors with fake chunk metadata.
+
+    An existing store of the same shape is reused. Returns the build time
+    in seconds (None when reused).
+    """
+    if store_exists(path):
+        manifest = read_manifest(path)
+        if manifest["count"] == n_rows and manifest["dim"] == dim:
+            return None
+        shutil.rmtree(path)
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    with StoreWriter(path, model="synthetic", shard_rows=None) as writer:
+        for start in range(0, n_rows, WRITE_BLOCK):
+            ids = range(start, min(start + WRITE_BLOCK, n_rows))
+            writer.append(rng.standard_normal((len(ids), dim), dtype=np.float32), {
+                "chunk_id": list(ids),
+                "number": [f"{i % 500:03d}" for i in ids],
+                "title": [f"Video {i % 500}" for i in ids],
+                "text": [f"synthetic chunk {i} about topic {i % 997}" for i in ids],
+            })
+    lexical_index.build_for_store(path)
+    return round(time.perf_counter() - started, 3)
+
+
+# ============================================================
+# 🔍 Retrieval: load time, per-query latency, batch throughput
+# ============================================================
+def search_mode(index):
+    if index.ann is not None:
+        return "ivf"
+    if index.quantizer is not None:
+        return index.quantizer.kind
+    return "exact"
+
+
+def bench_retrieval(path, n_queries=QUERIES, batch=BATCH_QUERIES, top_k=TOP_K, nprobe=None, seed=1):
+    started = time.perf_counter()
+    index = RetrievalIndex.from_store(path)
+    load_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed)
+    queries = rng.standard_normal((max(n_queries, batch), index.matrix.shape[1]), dtype=np.float32)
+    index.search(queries[0], top_k, nprobe)  # warm-up: page in the mmap
+
+    result = {"rows": len(index), "load_seconds": round(load_seconds, 3), "mode": search_mode(index)}
+    latencies = []
+    for q in queries[:n_queries]:
+        t = time.perf_counter()
+        index.search(q, top_k, nprobe)
+        latencies.append(time.perf_counter() - t)
+    result["search_ms"] = summarize_ms(latencies)
+
+    if result["mode"] != "exact":
+        latencies = []
+        for q in queries[:n_queries]:
+            t = time.perf_counter()
+            index.search(q, top_k, exact=True)
+            latencies.append(time.perf_counter() - t)
+        result["exact_search_ms"] = summarize_ms(latencies)
+
+    t = time.perf_counter()
+    index.search_batch(queries[:batch], top_k)
+    elapsed = time.perf_counter() - t
+    result["batch"] = {"queries": batch, "seconds": round(elapsed, 3),
+                       "queries_per_sec": round(batch / elapsed, 1)}
+    return result
+
+
+# ============================================================
+# 💬 /chat Load Test (uvicorn + fake Ollama)
+# ============================================================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, ollama_url, port):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, OLLAMA_URL=ollama_url, INDEX_POLL_SECONDS="0",
+               EMBED_CACHE=os.path.join(workdir, "embedding_cache.sqlite3"))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start in time")
+
+
+async def load_test_chat(base_url, n_requests=CHAT_REQUESTS, concurrency=CHAT_CONCURRENCY):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(client, i):
+        nonlocal errors
+        async with semaphore:
+            t = time.perf_counter()
+            try:
+                r = await client.post(f"{base_url}/chat", headers={"X-Cache-Bypass": "1"}, json={
+                    "question": f"benchmark question {i}", "session_id": f"bench-{i % concurrency}"})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 2),
+        "latency_ms": summarize_ms(latencies) if latencies else None,
+    }
+
+
+def bench_chat(bench_dir, corpus_rows=CHAT_CORPUS, dim=EMBED_DIM, n_requests=CHAT_REQUESTS,
+               concurrency=CHAT_CONCURRENCY, latency=LATENCY, token_rate=TOKEN_RATE,
+               answer_tokens=ANSWER_TOKENS):
+    workdir = os.path.abspath(os.path.join(bench_dir, "chat"))
+    os.makedirs(workdir, exist_ok=True)
+    make_corpus(os.path.join(workdir, "vector_store"), corpus_rows, dim)
+    for name in os.listdir(workdir):
+        if name.startswith(("chat_memory.sqlite3", "embedding_cache.sqlite3")):
+            os.remove(os.path.join(workdir, name))  # every run starts cold
+
+    fake = FakeOllama(port=0, dim=dim, latency=latency, token_rate=token_rate,
+                      answer_tokens=answer_tokens).start()
+    port = free_port()
+    server = start_server(workdir, fake.url, port)
+    try:
+        result = asyncio.run(load_test_chat(f"http://127.0.0.1:{port}", n_requests, concurrency))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        fake.stop()
+    result.update({"corpus_rows": corpus_rows, "ollama_latency": latency,
+                   "token_rate": token_rate, "answer_tokens": answer_tokens,
+                   "ollama_calls": dict(fake.calls)})
+    return result
+
+
+# ============================================================
+# ▶️ Runner
+# ============================================================
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run(args):
+    report = {"environment": environment(), "config": vars(args), "retrieval": [], "chat": None}
+    for size in args.sizes:
+        path = os.path.join(args.dir, f"corpus-{size}")
+        print(f"🧪 Corpus {size} x {args.dim}...", file=sys.stderr)
+        entry = {"size": size, "build_seconds": make_corpus(path, size, args.dim)}
+        if args.ann and size >= ann_index.MIN_ROWS_FOR_ANN:
+            ann_index.build_for_store(path)
+        if args.quantize:
+            quantization.build_for_store(path, args.quantize)
+        entry.update(bench_retrieval(path, args.queries, args.batch, args.top_k, args.nprobe))
+        report["retrieval"].append(entry)
+        print(f"   load {entry['load_seconds']}s, p50 {entry['search_ms']['p50']}ms, "
+              f"p99 {entry['search_ms']['p99']}ms, batch {entry['batch']['queries_per_sec']} q/s",
+              file=sys.stderr)
+
+    if args.chat_requests > 0:
+        print(f"💬 /chat load test ({args.chat_requests} requests, {args.concurrency} concurrent)...",
+              file=sys.stderr)
+        report["chat"] = bench_chat(args.dir, args.chat_corpus, args.dim, args.chat_requests,
+                                    args.concurrency, args.latency, args.token_rate, args.tokens)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval and /chat benchmarks (JSON report)")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=list(SIZES),
+                        help="comma-separated corpus sizes, e.g. 10000,100000")
+    parser.add_argument("--dim", type=int, default=EMBED_DIM)
+    parser.add_argument("--dir", default=BENCH_DIR, help="where synthetic stores are kept between runs")
+    parser.add_argument("--queries", type=int, default=QUERIES)
+    parser.add_argument("--batch", type=int, default=BATCH_QUERIES)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--ann", action="store_true", help="build and use an IVF index")
+    parser.add_argument("--nprobe", type=int, default=None)
+    parser.add_argument("--quantize", choices=sorted(quantization.QUANTIZERS), default=None)
+    parser.add_argument("--chat-requests", type=int, default=CHAT_REQUESTS, help="0 skips the /chat test")
+    parser.add_argument("--chat-corpus", type=int, default=CHAT_CORPUS)
+    parser.add_argument("--concurrency", type=int, default=CHAT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="fake Ollama response delay (s)")
+    parser.add_argument("--token-rate", type=float, default=TOKEN_RATE, help="fake Ollama tokens/sec")
+    parser.add_argument("--tokens", type=int, default=ANSWER_TOKENS, help="fake Ollama tokens per answer")
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+        print(f"✅ Wrote {args.out}", file=sys.stderr)
+    else:
+        print(report)
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+EMBED_MODEL = "bge-m3"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api")
+CACHE_FILE = "embedding_cache.sqlite3"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+MEMORY_ITEMS = 2048
+POOL_SIZE = 8
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 💾 Two-Tier Embedding Cache
+# ============================================================
+class EmbeddingCache:
+    """In-process LRU in front of a persistent SQLite table.
+
+    Keys are sha256(model, text). When the table grows past `max_bytes`
+    of vector data, the least recently used rows are evicted.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_bytes=CACHE_MAX_BYTES, memory_items=MEMORY_ITEMS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.memory = OrderedDict()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self.disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """Return a list aligned with `keys`; None marks a miss."""
+        found = [None] * len(keys)
+        with self._lock:
+            disk_lookup = {}
+            for i, key in enumerate(keys):
+                vector = self.memory.get(key)
+                if vector is not None:
+                    self.memory.move_to_end(key)
+                    self.hits_memory += 1
+                    found[i] = vector
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+            if not disk_lookup:
+                return found
+
+            rows = []
+            lookup_keys = list(disk_lookup)
+            for start in range(0, len(lookup_keys), 500):
+                part = lookup_keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows += self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember(key, vector)
+                for i in disk_lookup[key]:
+                    found[i] = vector
+                self.hits_disk += len(disk_lookup[key])
+            if rows:
+                now = time.time()
+                self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                     [(now, key) for key, _ in rows])
+                self._db.commit()
+            self.misses += sum(1 for v in found if v is None)
+        return found
+
+    def put_many(self, keys, vectors):
+        now = time.time()
+        with self._lock:
+            rows = []
+            for key, vector in zip(keys, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), vector.nbytes, now))
+            existing = 0
+            for start in range(0, len(rows), 500):
+                part = [r[0] for r in rows[start:start + 500]]
+                marks = ",".join("?" * len(part))
+                existing += self._db.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({marks})", part
+                ).fetchone()[0]
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self.disk_bytes += sum(r[2] for r in rows) - existing
+            if self.disk_bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Trim to 90% so eviction is not triggered again by the next insert
+        excess = self.disk_bytes - int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            if excess <= 0:
+                break
+            victims.append((key,))
+            excess -= size
+            self.disk_bytes -= size
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "memory_items": len(self.memory),
+            "disk_bytes": self.disk_bytes,
+        }
+
+
+# ============================================================
+# 🌐 Embedding Client
+# ============================================================
+def make_session(pool_size=POOL_SIZE):
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class EmbeddingClient:
+    """Ollama embeddings over a pooled session, with the two-tier cache."""
+
+    def __init__(self, model=EMBED_MODEL, base_url=OLLAMA_URL, cache=None, pool_size=POOL_SIZE):
+        self.model = model
+        self.base_url = base_url
+        self.cache = cache
+        self.session = make_session(pool_size)
+
+    def _request(self, texts):
+        # /api/embed takes a list of inputs, one round trip per batch
+        res = self.session.post(f"{self.base_url}/embed", json={"model": self.model, "input": texts},
+                                timeout=300)
+        res.raise_for_status()
+        return np.asarray(res.json()["embeddings"], dtype=np.float32)
+
+    def _lookup(self, texts):
+        keys = [cache_key(self.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+        missing = {}
+        for i, vector in enumerate(found):
+            if vector is None:
+                missing.setdefault(keys[i], (texts[i], []))[1].append(i)
+        return found, missing
+
+    @staticmethod
+    def _fill(found, missing, vectors):
+        for vector, (_, rows) in zip(vectors, missing.values()):
+            for i in rows:
+                found[i] = vector
+        return np.vstack(found) if found else np.empty((0, 0), dtype=np.float32)
+
+    def embed_many(self, texts):
+        """Embed a batch of texts; only cache misses go to Ollama."""
+        texts = list(texts)
+        if self.cache is None:
+            return self._request(texts)
+        found, missing = self._lookup(texts)
+        vectors = []
+        if missing:
+            vectors = self._request([text for text, _ in missing.values()])
+            self.cache.put_many(list(missing), vectors)
+        return self._fill(found, missing, vectors)
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    async def aembed_many(self, texts, ollama):
+        """embed_many for the event loop: SQLite work runs in a thread and
+        cache misses go through the shared AsyncOllamaClient."""
+        texts = list(texts)
+        if self.cache is None:
+            return await ollama.embed(self.model, texts)
+        found, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = []
+        if missing:
+            vectors = await ollama.embed(self.model, [text for text, _ in missing.values()])
+            await asyncio.to_thread(self.cache.put_many, list(missing), vectors)
+        return self._fill(found, missing, vectors)
+
+    async def aembed(self, text, ollama):
+        return (await self.aembed_many([text], ollama))[0]
+
+
+_clients = {}
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_client(model=EMBED_MODEL):
+    """Process-wide client per model; all of them share one cache."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(os.environ.get("EMBED_CACHE", CACHE_FILE))
+        if model not in _clients:
+            _clients[model] = EmbeddingClient(model=model, cache=_default_cache)
+        return _clients[model]
+
+
+def create_embedding(text):
+    try:
+        return get_client().embed(text)
+    except Exception as e:
+        print(f"❌ Embedding Error: {e}")
+        return None
@@ -0,0 +1,140 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+PORT = 11435               # next to the real Ollama port, so both can run
+EMBED_DIM = 1024           # bge-m3
+LATENCY = 0.05             # seconds before an embedding / the first token
+TOKEN_RATE = 50.0          # generated tokens per second
+ANSWER_TOKENS = 64
+
+
+def fake_embedding(text, dim=EMBED_DIM):
+    # Deterministic per text, so embedding caches behave as with a real model
+    seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+# ============================================================
+# 🦙 Ollama Stand-in (/api/embed, /api/embeddings, /api/generate)
+# ============================================================
+class FakeOllama:
+    """Local HTTP server that answers like Ollama with controllable speed.
+
+    Embeddings are random but stable per text; generations emit
+    `answer_tokens` words at `token_rate` per second after `latency`
+    seconds, streamed as NDJSON when asked to. Counts calls per endpoint.
+    """
+
+    def __init__(self, port=PORT, dim=EMBED_DIM, latency=LATENCY, token_rate=TOKEN_RATE,
+                 answer_tokens=ANSWER_TOKENS):
+        self.dim = dim
+        self.latency = latency
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+        self.calls = {"embed": 0, "embeddings": 0, "generate": 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api"
+
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                self._json({"calls": fake.calls} if self.path == "/calls" else {"status": "ok"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                time.sleep(fake.latency)
+                if self.path == "/api/embed":
+                    fake._count("embed")
+                    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    self._json({"embeddings": [fake_embedding(t, fake.dim).tolist() for t in texts]})
+                elif self.path == "/api/embeddings":
+                    fake._count("embeddings")
+                    self._json({"embedding": fake_embedding(body["prompt"], fake.dim).tolist()})
+                elif self.path == "/api/generate":
+                    fake._count("generate")
+                    self._generate(body.get("stream", True))
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+
+            def _generate(self, stream):
+                words = [f"token{i} " for i in range(fake.answer_tokens)]
+                delay = 1.0 / fake.token_rate if fake.token_rate > 0 else 0.0
+                if not stream:
+                    time.sleep(delay * len(words))
+                    self._json({"response": "".join(words), "done": True})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for word in words:
+                    time.sleep(delay)
+                    self._chunk({"response": word, "done": False})
+                self._chunk({"response": "", "done": True})
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for benchmarks and local testing")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--dim", type=int, default=EMBED_DIM)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds before responding")
+    parser.add_argument("--token-rate", type=float, default=TOKEN_RATE, help="generated tokens per second")
+    parser.add_argument("--tokens", type=int, default=ANSWER_TOKENS, help="tokens per generated answer")
+    args = parser.parse_args()
+    fake = FakeOllama(args.port, args.dim, args.latency, args.token_rate, args.tokens)
+    print(f"🦙 Fake Ollama on {fake.url} (latency {args.latency}s, {args.token_rate} tok/s)")
+    fake.server.serve_forever()
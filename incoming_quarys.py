@@ -1,25 +1,15 @@
 import requests
 import joblib
-import numpy as np
 import sys
 import time
 import os
-from sklearn.metrics.pairwise import cosine_similarity
+from retrieval_index import RetrievalIndex
+from vector_store import STORE_DIR, store_exists
 
 # ============================================================
-# 🧩 Create Embedding Function
+# 🧩 Create Embedding Function (shared, cached client)
 # ============================================================
-def create_embedding(text):
-    try:
-        response = requests.post("http://localhost:11434/api/embeddings", json={
-            "model": "bge-m3",
-            "prompt": text
-        })
-        response.raise_for_status()
-        return response.json()["embedding"]
-    except Exception as e:
-        print(f"❌ Embedding Error: {e}")
-        return None
+from embedding_client import create_embedding
 
 # ============================================================
 # 💬 Generate AI Response (RAG + Intent + Memory)
@@ -117,7 +107,10 @@ def save_memory(memory):
 # 📊 Load Embeddings
 # ============================================================
 try:
-    df = joblib.load("embeddings.joblib")
+    if store_exists(STORE_DIR):
+        index = RetrievalIndex.from_store(STORE_DIR)
+    else:
+        index = RetrievalIndex.from_dataframe(joblib.load("embeddings.joblib"))
     print("✅ Embeddings loaded successfully!")
 except Exception as e:
     print(f"❌ Failed to load embeddings: {e}")
@@ -156,12 +149,9 @@ while True:
         continue
 
     # 🧮 RAG similarity
-    similarity = cosine_similarity(np.vstack(df['embedding']), [query_embedding]).flatten()
-    top_indices = similarity.argsort()[::-1][:5]
-    top_chunks = df.iloc[top_indices]["text"].tolist()
+    top_chunks, max_sim = index.top_chunks(query_embedding, top_k=5)
 
     context = "\n\n".join(top_chunks)
-    max_sim = float(similarity[top_indices[0]])
     use_context = max_sim > 0.45
 
     # 🧠 Check if memory is too large
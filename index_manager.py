@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+
+# ============================================================
+# 🔄 Hot-Reloading Index Manager
+# ============================================================
+class IndexManager:
+    """Holds the live RetrievalIndex and swaps in new versions in place.
+
+    `version_of()` returns a cheap on-disk version token (the store
+    manifest version, or the joblib file's mtime). A background task polls
+    it; when it changes, `load()` builds the new index in a worker thread
+    and only the finished object is assigned to `self.index`. Requests
+    read `self.index` once and keep that reference for the whole request,
+    so they never see a half-loaded index, and the old one is freed when
+    the last request using it finishes.
+    """
+
+    def __init__(self, load, version_of, poll_interval=10.0):
+        self.load = load
+        self.version_of = version_of
+        self.poll_interval = poll_interval
+        self.index = None
+        self.version = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self._lock = None
+        self._task = None
+
+    def _disk_version(self):
+        try:
+            return self.version_of()
+        except Exception:
+            return None  # nothing on disk yet, or a write is in progress
+
+    def _swap(self, index, version, seconds):
+        # A single reference assignment: readers see the old or the new index, never a mix
+        self.index = index
+        self.version = version
+        self.loaded_at = time.time()
+        self.load_seconds = round(seconds, 3)
+
+    def load_now(self):
+        """Blocking first load (at startup); failures leave index as None."""
+        version = self._disk_version()
+        started = time.perf_counter()
+        try:
+            index = self.load()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(f"❌ Error loading embeddings: {e}")
+            return None
+        self._swap(index, version, time.perf_counter() - started)
+        print(f"✅ Loaded embeddings ({len(index)} chunks).")
+        return index
+
+    async def reload(self, force=False):
+        """Load the on-disk index in a worker thread if its version changed."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            version = self._disk_version()
+            if not force and (version is None or version == self.version):
+                return False
+            started = time.perf_counter()
+            try:
+                index = await asyncio.to_thread(self.load)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"❌ Index Reload Error: {e}")
+                return False
+            self._swap(index, version, time.perf_counter() - started)
+            self.reloads += 1
+            self.last_error = None
+            print(f"🔄 Reloaded index version {version} ({len(index)} chunks in {self.load_seconds}s)")
+            return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.reload()
+
+    def start(self):
+        if self._task is None and self.poll_interval > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self):
+        return {
+            "version": self.version,
+            "disk_version": self._disk_version(),
+            "chunks": len(self.index) if self.index is not None else 0,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "reloading": self._lock is not None and self._lock.locked(),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "poll_interval": self.poll_interval,
+        }
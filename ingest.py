@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import lexical_index
+import quantization
+import ann_index
+from embedding_client import EMBED_MODEL, get_client
+from vector_store import (META_COLUMNS, STORE_DIR, StoreWriter, load_ingest_state, read_manifest, store_exists,
+                          store_lock)
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+JSON_FOLDER = "jsons"
+BATCH_SIZE = 32
+CONCURRENCY = 4
+
+
+# ============================================================
+# 📂 Chunk Source
+# ============================================================
+# Sort files numerically (e.g., video1, video2, video10)
+def extract_number(filename):
+    match = re.search(r"\d+", filename)
+    return int(match.group(0)) if match else float('inf')
+
+
+def list_json_files(json_folder):
+    files = [f for f in os.listdir(json_folder) if f.endswith(".json")]
+    return sorted(files, key=extract_number)
+
+
+def video_number_for(content, json_file):
+    raw_number = content.get("video_number", os.path.splitext(json_file)[0])
+    match = re.search(r"\d+", str(raw_number))
+    return match.group(0).zfill(3) if match else "unknown"
+
+
+def iter_file_chunks(content, video_number):
+    for chunk in content.get("chunks", []):
+        text = chunk.get("text", "").strip()
+        if not text:
+            continue  # skip empty chunks
+        yield {"text": text, "title": chunk.get("title"), "number": video_number}
+
+
+def chunk_hash(chunk):
+    key = f"{chunk['number']}\0{chunk['title']}\0{chunk['text']}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 🧾 Incremental Plan (content-hash manifest)
+# ============================================================
+class IngestPlan:
+    """Diff jsons/ against the hashes recorded by the previous run.
+
+    Unchanged files (same file hash) are skipped without being parsed.
+    In changed files, chunks whose hash was seen before keep their chunk
+    id; only new chunks are yielded for embedding, and ids that no longer
+    appear anywhere are collected in `deleted`.
+
+    `files` keeps one [hash, chunk_id] pair per chunk of the corpus (about
+    100 bytes each) until the commit writes it out, so unlike the vectors
+    and text, ingest memory does grow with the number of chunks.
+    """
+
+    def __init__(self, json_folder, previous_files=None, next_chunk_id=0):
+        self.json_folder = json_folder
+        self.previous_files = previous_files or {}
+        self.next_chunk_id = next_chunk_id
+        self.files = {}
+        self.deleted = set()
+        self.unchanged_files = 0
+        self.changed_files = 0
+
+    def new_chunks(self):
+        for json_file in list_json_files(self.json_folder):
+            with open(os.path.join(self.json_folder, json_file), "rb") as f:
+                raw = f.read()
+            file_hash = hashlib.sha256(raw).hexdigest()
+            previous = self.previous_files.get(json_file)
+            if previous and previous["hash"] == file_hash:
+                self.files[json_file] = previous
+                self.unchanged_files += 1
+                continue
+
+            self.changed_files += 1
+            print(f"🎬 Processing {json_file}...")
+            known = {}
+            for h, cid in (previous or {}).get("chunks", []):
+                known.setdefault(h, []).append(cid)
+
+            entries = []
+            content = json.loads(raw.decode("utf-8"))
+            for chunk in iter_file_chunks(content, video_number_for(content, json_file)):
+                h = chunk_hash(chunk)
+                if known.get(h):
+                    entries.append([h, known[h].pop()])
+                    continue
+                chunk["chunk_id"] = self.next_chunk_id
+                self.next_chunk_id += 1
+                entries.append([h, chunk["chunk_id"]])
+                yield chunk
+            for ids in known.values():
+                self.deleted.update(ids)
+            self.files[json_file] = {"hash": file_hash, "chunks": entries}
+
+        for json_file, previous in self.previous_files.items():
+            if json_file not in self.files:
+                print(f"🗑️ Removing {json_file} (no longer in {self.json_folder}/)")
+                self.deleted.update(cid for _, cid in previous["chunks"])
+
+    def state(self):
+        return {"files": self.files}
+
+
+# ============================================================
+# 🌊 Streaming Stages (files → chunks → embedding batches → store)
+# ============================================================
+def stream_chunks(json_folder, files=None, start_id=0):
+    """Yield every chunk with a fresh chunk_id, one JSON file in memory at a time."""
+    chunk_id = start_id
+    for json_file in files if files is not None else list_json_files(json_folder):
+        with open(os.path.join(json_folder, json_file), "r", encoding="utf-8") as f:
+            content = json.load(f)
+        for chunk in iter_file_chunks(content, video_number_for(content, json_file)):
+            chunk["chunk_id"] = chunk_id
+            chunk_id += 1
+            yield chunk
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ============================================================
+# 🔁 Ingestion Pipeline
+def embed_batches(chunks, embed_many, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+    """Yield (batch, vectors) in input order.
+
+    At most `concurrency` batches are being embedded at once and nothing
+    further is read from `chunks` until the oldest one is consumed, so
+    memory stays at a few batches however long the stream is.
+    """
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in batched(chunks, batch_size):
+            if len(pending) >= concurrency:
+                done, future = pending.popleft()
+                yield done, future.result()
+            pending.append((batch, pool.submit(embed_many, [c["text"] for c in batch])))
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+
+def write_batches(writer, embedded, report_every=10):
+    """Append (batch, vectors) pairs to a StoreWriter; returns rows written."""
+    started = time.perf_counter()
+    written = 0
+    for batches_done, (batch, vectors) in enumerate(embedded, start=1):
+        writer.append(vectors, {c: [chunk.get(c) for chunk in batch] for c in META_COLUMNS})
+        written += len(batch)
+        if batches_done % report_every == 0:
+            rate = written / (time.perf_counter() - started)
+            print(f"⏳ {written} chunks embedded ({rate:.1f} chunks/sec)")
+    return written
+
+
+# ============================================================
+def ingest(json_folder=JSON_FOLDER, store_path=STORE_DIR, batch_size=BATCH_SIZE,
+           concurrency=CONCURRENCY, model=EMBED_MODEL, full=False, report_every=10):
+    """Embed new or changed chunks under json_folder into the vector store.
+
+    The plan's chunks stream through embed_batches() into a StoreWriter,
+    which seals a segment every SHARD_ROWS rows. Unless `full` is set (or
+    the store was built with a different model), the new vectors are
+    appended to the existing store and vanished chunks are marked deleted.
+    The store lock is held for the whole run, from reading the previous
+    ingest state to updating the side indexes.
+    """
+    # Held until the side indexes are current: uploads and other writers wait
+    with store_lock(store_path):
+        append = not full and store_exists(store_path)
+        if append and read_manifest(store_path)["model"] != model:
+            print(f"⚠️ Store was built with a different model — rebuilding with {model}")
+            append = False
+        previous = (load_ingest_state(store_path) or {}).get("files") if append else None
+        if append and previous is None:
+            # e.g. a store converted from embeddings.joblib has no hashes to diff against
+            print("⚠️ Store has no ingest manifest — rebuilding from scratch")
+            append = False
+        next_chunk_id = read_manifest(store_path)["next_chunk_id"] if append else 0
+        plan = IngestPlan(json_folder, previous, next_chunk_id)
+
+        client = get_client(model)
+        started = time.perf_counter()
+
+        with StoreWriter(store_path, model=model, append=append) as writer:
+            embedded = embed_batches(plan.new_chunks(), client.embed_many, batch_size, concurrency)
+            written = write_batches(writer, embedded, report_every)
+            if append and not plan.changed_files and not plan.deleted:
+                print("✅ Index is already up to date")
+                writer.cancel()
+                return 0
+            writer.deleted.update(plan.deleted)
+            writer.next_chunk_id = max(writer.next_chunk_id, plan.next_chunk_id)
+            writer.ingest_state = plan.state()
+
+        elapsed = time.perf_counter() - started
+        rate = written / elapsed if elapsed > 0 else 0.0
+        print(f"📋 {plan.changed_files} changed / {plan.unchanged_files} unchanged files, "
+              f"{len(plan.deleted)} chunks removed")
+        print(f"✅ Embedded {written} chunks in {elapsed:.1f}s ({rate:.1f} chunks/sec)")
+        print(f"💾 Embedding cache: {client.cache.stats()}")
+        update_side_indexes(store_path, retrain=not append)
+        return written
+
+
+def update_side_indexes(store_path, retrain=False):
+    """Bring the BM25 index (always) and any IVF / quantized codes up to the new store version.
+
+    When the store was only appended to, just the new rows are added: BM25
+    tokenizes their text alone, IVF assigns them to the existing lists and
+    codes are encoded with the existing codebooks. Everything is rebuilt
+    with `retrain` (ingest.py --full), after compaction, or by running the
+    index's own script (e.g. `python ann_index.py`).
+    """
+    with store_lock(store_path):
+        bm25, added = lexical_index.update_for_store(store_path, retrain)
+        if added is None:
+            print(f"🔤 Built BM25 index ({len(bm25.terms)} terms)")
+        else:
+            print(f"🔤 Added {added} rows to the BM25 index ({len(bm25.terms)} terms)")
+        if os.path.exists(os.path.join(store_path, ann_index.ANN_FILE)):
+            # Keep an existing ANN index in step with the new store version
+            ann, added = ann_index.update_for_store(store_path, retrain)
+            if added is None:
+                print(f"🗂️ Rebuilt IVF index ({ann.n_lists} lists)")
+            else:
+                print(f"🗂️ Added {added} rows to the IVF index ({ann.n_lists} lists)")
+        kind = quantization.stored_kind(store_path)
+        if kind:
+            _, added = quantization.update_for_store(store_path, kind, retrain)
+            if added is None:
+                print(f"🔢 Rebuilt {kind} codes")
+            else:
+                print(f"🔢 Encoded {added} new rows as {kind} codes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed chunk JSONs into the vector store")
+    parser.add_argument("--jsons", default=JSON_FOLDER)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--full", action="store_true", help="re-embed everything from scratch")
+    args = parser.parse_args()
+    ingest(args.jsons, args.store, args.batch_size, args.concurrency, args.model, args.full)
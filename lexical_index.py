@@ -0,0 +1,246 @@
+import argparse
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from retrieval_index import top_k_indices
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+BM25_FILE = "bm25.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60                  # reciprocal rank fusion: 1 / (RRF_K + rank)
+HYBRID_CANDIDATES = 50      # hits taken from each retriever before fusion
+STRONG_COVERAGE = 0.9       # share of the query's idf weight found in the top hit
+STRONG_MARGIN = 1.5         # top hit vs the first hit that didn't make top-k
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# ============================================================
+# 🔤 BM25 Inverted Index
+# ============================================================
+def _tokenize_rows(texts, vocab, first_row=0):
+    """Postings (term ids, row ids, tf) and token counts for `texts`.
+
+    Rows are numbered from `first_row`; unseen terms are added to `vocab`.
+    """
+    term_ids, row_ids, tfs = [], [], []
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for i, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        lengths[i] = sum(counts.values())
+        for term, tf in counts.items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            row_ids.append(first_row + i)
+            tfs.append(tf)
+    return (np.asarray(term_ids, dtype=np.int64), np.asarray(row_ids, dtype=np.int32),
+            np.asarray(tfs, dtype=np.float32), lengths)
+
+
+class BM25Index:
+    """Inverted index over chunk text, scored with BM25.
+
+    Postings are stored CSR-style: `rows[offsets[t]:offsets[t + 1]]` are the
+    (ascending) row ids containing term t and `impacts` the matching
+    length-normalized tf weights, precomputed at build time. A query only
+    touches the postings of its own terms: score = sum(idf[t] * impact).
+
+    Raw term frequencies and row lengths are kept too, so extend() can add
+    appended rows by tokenizing only those and recomputing the weights.
+    """
+
+    def __init__(self, terms, offsets, rows, impacts, idf, n_rows, store_version=None,
+                 tf=None, lengths=None, segments=None):
+        self.terms = list(terms)
+        self.vocab = {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.impacts = impacts
+        self.idf = idf
+        self.n_rows = n_rows
+        self.store_version = store_version
+        self.tf = tf
+        self.lengths = lengths
+        # Store segments the rows came from (see vector_store.only_appended)
+        self.segments = segments
+
+    @classmethod
+    def build(cls, texts, store_version=None, segments=None, k1=BM25_K1, b=BM25_B):
+        vocab = {}
+        term_ids, rows, tf, lengths = _tokenize_rows(texts, vocab)
+        return cls._from_postings(list(vocab), term_ids, rows, tf, lengths, store_version, segments, k1, b)
+
+    def extend(self, texts, store_version=None, segments=None, k1=BM25_K1, b=BM25_B):
+        """New index with `texts` as rows n_rows.. ; existing rows are not re-tokenized."""
+        vocab = dict(self.vocab)
+        term_ids, rows, tf, lengths = _tokenize_rows(texts, vocab, first_row=self.n_rows)
+        old_terms = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))
+        return self._from_postings(list(vocab), np.concatenate([old_terms, term_ids]),
+                                   np.concatenate([self.rows, rows]), np.concatenate([self.tf, tf]),
+                                   np.concatenate([self.lengths, lengths]), store_version, segments, k1, b)
+
+    @classmethod
+    def _from_postings(cls, terms, term_ids, row_ids, tf, lengths, store_version, segments, k1, b):
+        # Stable sort keeps row ids ascending inside every posting list
+        order = np.argsort(term_ids, kind="stable")
+        rows = row_ids[order].astype(np.int32)
+        tf = tf[order]
+        df = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        avg_len = float(lengths.mean()) if len(lengths) else 1.0
+        norm = k1 * (1 - b + b * lengths[rows] / max(avg_len, 1.0))
+        impacts = (tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        n = len(lengths)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        return cls(terms, offsets, rows, impacts, idf, n, store_version, tf=tf, lengths=lengths,
+                   segments=segments)
+
+    def query_terms(self, text):
+        return sorted({self.vocab[t] for t in tokenize(text) if t in self.vocab})
+
+    def search(self, text, top_k=5, allowed=None, live=None):
+        """Return (row_ids, scores, coverage, margin) for the best BM25 matches.
+
+        `coverage` is the share of the query's idf weight that the top hit
+        contains (1.0 = every query term occurs in it); `margin` is
+        the top score over the score of the first hit outside the top-k.
+        `allowed` (sorted row ids) restricts the hits, e.g. to a metadata
+        filter, and rows with `live` False (deleted) are never returned.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), 0.0, 0.0
+        term_ids = self.query_terms(text)
+        if not term_ids:
+            return empty
+        scores = np.zeros(self.n_rows, dtype=np.float32)
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            scores[self.rows[start:end]] += self.idf[t] * self.impacts[start:end]
+        touched = np.unique(np.concatenate([self.rows[self.offsets[t]:self.offsets[t + 1]]
+                                            for t in term_ids]))
+        if allowed is not None:
+            touched = np.intersect1d(touched, allowed, assume_unique=True)
+        if live is not None:
+            touched = touched[live[touched]]
+        if len(touched) == 0:
+            return empty
+        idx = touched[top_k_indices(scores[touched], top_k + 1)]
+
+        top = idx[0]
+        weights = self.idf[term_ids]
+        present = [self._contains(t, top) for t in term_ids]
+        # Query words the corpus has never seen count as maximally rare misses
+        unknown = len({t for t in tokenize(text) if t not in self.vocab})
+        total = weights.sum() + unknown * np.log1p((self.n_rows + 0.5) / 0.5)
+        coverage = float(weights[present].sum() / total) if total > 0 else 0.0
+        margin = float(scores[top] / scores[idx[top_k]]) if len(idx) > top_k else float("inf")
+        return idx[:top_k].astype(np.int64), scores[idx[:top_k]], coverage, margin
+
+    def _contains(self, term_id, row):
+        postings = self.rows[self.offsets[term_id]:self.offsets[term_id + 1]]
+        i = np.searchsorted(postings, row)
+        return i < len(postings) and postings[i] == row
+
+    # --------------------------
+    # 💾 Persistence (next to the vector store)
+    # --------------------------
+    def save(self, store_path):
+        path = os.path.join(store_path, BM25_FILE)
+        tmp = path + ".tmp"
+        extra = {} if self.tf is None else {"tf": self.tf, "lengths": self.lengths}
+        with open(tmp, "wb") as f:
+            np.savez(f, terms=np.array(self.terms, dtype=str), offsets=self.offsets, rows=self.rows,
+                     impacts=self.impacts, idf=self.idf, n_rows=np.int64(self.n_rows),
+                     store_version=np.int64(-1 if self.store_version is None else self.store_version),
+                     segments=np.array(self.segments or [], dtype=str), **extra)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, store_path):
+        path = os.path.join(store_path, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            version = int(data["store_version"])
+            # Files written before tf/segments were kept can only be rebuilt
+            extra = {k: data[k] for k in ("tf", "lengths") if k in data.files}
+            if "segments" in data.files:
+                extra["segments"] = data["segments"].tolist()
+            return cls(data["terms"].tolist(), data["offsets"], data["rows"], data["impacts"],
+                       data["idf"], int(data["n_rows"]), None if version < 0 else version, **extra)
+
+
+def is_strong(coverage, margin):
+    """Whether a lexical result is decisive enough to skip embedding."""
+    return coverage >= STRONG_COVERAGE and margin >= STRONG_MARGIN
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked row-id lists: score(row) = sum over lists of 1 / (k + rank)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[int(row)] = fused.get(int(row), 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+def load_lexical(store_path, manifest, texts):
+    """Load the persisted BM25 index, or build it in memory if missing/stale."""
+    index = BM25Index.load(store_path)
+    if index is not None and index.store_version == manifest["version"] and index.n_rows == len(texts):
+        return index
+    if index is not None:
+        print("⚠️ BM25 index is stale — rebuilding in memory (persist with `python lexical_index.py`)")
+    return BM25Index.build(texts, store_version=manifest["version"])
+
+
+def build_for_store(store_path):
+    from vector_store import load_meta, read_manifest, segment_names, store_lock
+
+    with store_lock(store_path):
+        manifest = read_manifest(store_path)
+        texts = load_meta(store_path, manifest["segments"], ("text",))["text"]
+        index = BM25Index.build(texts, store_version=manifest["version"], segments=segment_names(manifest))
+        index.save(store_path)
+    return index
+
+
+def update_for_store(store_path, rebuild=False):
+    """Bring the persisted BM25 index up to the current store version.
+
+    Only the metadata files are read. If the store only gained segments
+    since the index was saved, just their text is tokenized and merged in;
+    otherwise (or with `rebuild`) the index is built from scratch.
+    Returns (index, rows added), with rows added None after a rebuild.
+    """
+    from vector_store import load_meta, only_appended, read_manifest, segment_names, store_lock
+
+    with store_lock(store_path):
+        manifest = read_manifest(store_path)
+        index = None if rebuild else BM25Index.load(store_path)
+        if index is None or index.tf is None or not only_appended(manifest, index.segments, index.n_rows):
+            return build_for_store(store_path), None
+        texts = load_meta(store_path, manifest["segments"][len(index.segments):], ("text",))["text"]
+        index = index.extend(texts, store_version=manifest["version"], segments=segment_names(manifest))
+        index.save(store_path)
+    return index, len(texts)
+
+
+if __name__ == "__main__":
+    from vector_store import STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Build the BM25 inverted index for a vector store")
+    parser.add_argument("--store", default=STORE_DIR)
+    args = parser.parse_args()
+    index = build_for_store(args.store)
+    print(f"✅ Built BM25 index: {index.n_rows} rows, {len(index.terms)} terms ({args.store}/{BM25_FILE})")
@@ -1,33 +1,74 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from starlette.concurrency import run_in_threadpool
 import joblib
-import numpy as np
+import json
 import os
 import time
 import sys
-from sklearn.metrics.pairwise import cosine_similarity
+from admission import Overloaded
+from ann_index import ANN_FILE
+from answer_cache import SemanticAnswerCache, context_key
+from embedding_client import get_client
+from index_manager import IndexManager
+from lexical_index import BM25_FILE, STRONG_COVERAGE
+from memory_store import DEFAULT_SESSION, MEMORY_DB, MemoryStore, join_memory
+from metrics import Metrics, MetricsMiddleware
+from ollama_client import AsyncOllamaClient
+from prompt_builder import PROMPT_TOKEN_BUDGET, SUMMARY_TOKEN_BUDGET, fit_prompt_parts, trim_memory
+from quantization import CODES_FILE
+from summarizer import MemorySummarizer
+from retrieval_index import RetrievalIndex
+from upload_indexer import MAX_UPLOAD_BYTES, UPLOAD_EXTENSIONS, UPLOAD_FOLDER, UPLOAD_READ_BYTES, UploadIndexer, \
+    UploadJob, is_supported
+from vector_store import STORE_DIR, read_manifest, store_exists
 
 # ============================================================
 # ⚙️ Configuration
 # ============================================================
 EMBED_MODEL = "bge-m3"
 LLM_MODEL = "llama3"
-OLLAMA_URL = "http://localhost:11434/api"
-HISTORY_FILE = "chat_history.txt"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api")
+MEMORY_FILE = MEMORY_DB
 EMBED_FILE = "embeddings.joblib"
-UPLOAD_FOLDER = "uploads"
+VECTOR_STORE = os.environ.get("VECTOR_STORE", STORE_DIR)
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", 8))  # IVF lists scanned per query (if built)
+LEXICAL_FAST_PATH = os.environ.get("LEXICAL_FAST_PATH", "1") != "0"  # answer strong BM25 hits without embedding
+PROMPT_BUDGET = int(os.environ.get("PROMPT_BUDGET", PROMPT_TOKEN_BUDGET))  # tokens sent to the LLM
+INDEX_POLL_SECONDS = float(os.environ.get("INDEX_POLL_SECONDS", 10))  # 0 = reload only via /admin/reload
+MAX_BATCH_QUERIES = 1000  # per /retrieve/batch request
+MAX_BATCH_TOP_K = 100     # top_k is clamped to 1..MAX_BATCH_TOP_K
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Shared, pooled connection to Ollama for every request
+ollama = AsyncOllamaClient(OLLAMA_URL)
+
+# Stage histograms / request counters for /metrics and Server-Timing headers
+metrics = Metrics()
+
 # ============================================================
 # 🌐 FastAPI App Setup
 # ============================================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    summarizer.start()
+    index_manager.start()
+    uploader.start()
+    yield
+    await uploader.stop()
+    await index_manager.stop()
+    await summarizer.stop()
+    await ollama.aclose()
+
+
 app = FastAPI(
     title="AppsterGPT FastAPI",
     description="RAG + Memory chatbot API by Arpit Kumar Mishra",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Enable CORS (frontend support)
@@ -37,72 +78,151 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Answer-Cache"],
 )
 
+# Times every request and adds a Server-Timing header with its stages
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # ============================================================
 # 🧩 Utilities
 # ============================================================
-def create_embedding(text: str):
+async def create_embedding(text: str):
     try:
-        res = requests.post(f"{OLLAMA_URL}/embeddings", json={"model": EMBED_MODEL, "prompt": text})
-        res.raise_for_status()
-        return res.json()["embedding"]
+        with metrics.stage("embedding"):
+            return await get_client(EMBED_MODEL).aembed(text, ollama)
     except Exception as e:
         print("❌ Embedding Error:", e)
         return None
 
 
-def query_llm(prompt: str):
+async def query_llm(prompt: str, session_id="", kind="chat"):
     try:
-        res = requests.post(f"{OLLAMA_URL}/generate", json={"model": LLM_MODEL, "prompt": prompt, "stream": False})
-        res.raise_for_status()
-        return res.json().get("response", "").strip()
+        return await ollama.generate(LLM_MODEL, prompt, session_id, kind)
+    except Overloaded:
+        raise  # answered with 429/503 + Retry-After by the route
     except Exception as e:
         print("❌ LLM Error:", e)
         return "⚠️ LLM generation failed."
 
 
-def load_memory():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    return ""
+memory_store = MemoryStore(MEMORY_FILE)
 
 
-def save_memory(memory: str):
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        f.write(memory.strip())
+def get_session_id(request: Request, data=None):
+    session_id = (data or {}).get("session_id") or request.headers.get("X-Session-Id") \
+        or request.query_params.get("session_id") or DEFAULT_SESSION
+    return str(session_id)[:128]
+
+
+async def load_memory_timed(session_id: str):
+    with metrics.stage("memory_load"):
+        return await run_in_threadpool(memory_store.load_parts, session_id)
 
 
 # ============================================================
 # 📊 Load Embeddings
 # ============================================================
-try:
-    df = joblib.load(EMBED_FILE)
-    print(f"✅ Loaded embeddings ({len(df)} chunks).")
-except Exception as e:
-    print(f"❌ Error loading embeddings: {e}")
-    df = None
+def load_index():
+    # Prefer the mmap vector store; fall back to the legacy joblib DataFrame
+    if store_exists(VECTOR_STORE):
+        return RetrievalIndex.from_store(VECTOR_STORE)
+    return RetrievalIndex.from_dataframe(joblib.load(EMBED_FILE))
+
+
+def index_version():
+    # Cheap on-disk token: changes when ingest/compaction commits or a
+    # side index (rebuilt right after the commit) is replaced
+    if store_exists(VECTOR_STORE):
+        sidecars = [os.path.join(VECTOR_STORE, f) for f in (ANN_FILE, CODES_FILE, BM25_FILE)]
+        stamps = [int(os.path.getmtime(p)) for p in sidecars if os.path.exists(p)]
+        return f"store:{read_manifest(VECTOR_STORE)['version']}:{max(stamps, default=0)}"
+    return f"joblib:{os.path.getmtime(EMBED_FILE)}"
+
+
+# New versions are loaded in the background and swapped in atomically
+index_manager = IndexManager(load_index, index_version, INDEX_POLL_SECONDS)
+index_manager.load_now()
+
+
+def current_index():
+    """The live index; read it once per request and keep the reference."""
+    return index_manager.index
+
+
+# Uploaded files are extracted, embedded and appended to the store in the
+# background; the new store version is then hot-swapped in
+uploader = UploadIndexer(get_client(EMBED_MODEL).embed_many, on_commit=index_manager.reload,
+                         store_path=VECTOR_STORE, model=EMBED_MODEL)
 
 # ============================================================
 # 🧠 RAG Retrieval
 # ============================================================
-def retrieve_top_chunks(query, top_k=5):
-    emb = create_embedding(query)
-    if emb is None or df is None:
+async def retrieve_top_rows(query, top_k=5, emb=None, rows=None, index=None):
+    """Hybrid (dense + BM25) top chunks with their metadata, for packing.
+
+    `rows` (from index.filter_rows, same index) limits the search to
+    matching chunks. Returns (rows, lexical_coverage).
+    """
+    if index is None:
+        index = current_index()
+    if emb is None:
+        emb = await create_embedding(query)
+    if emb is None or index is None:
         return [], 0.0
-    sims = cosine_similarity(np.vstack(df["embedding"]), [emb]).flatten()
-    idx = sims.argsort()[::-1][:top_k]
-    return df.iloc[idx]["text"].tolist(), float(sims[idx[0]])
+    with metrics.stage("retrieval"):
+        return await run_in_threadpool(index.hybrid_rows, query, emb, top_k, ANN_NPROBE, None, rows)
+
+
+async def retrieve_lexical(query, top_k=5, rows=None, index=None):
+    """BM25-only top chunks; returns (rows, strong_match)."""
+    if index is None:
+        index = current_index()
+    if index is None:
+        return [], False
+    with metrics.stage("lexical"):
+        return await run_in_threadpool(index.lexical_rows, query, top_k, rows)
+
+
+def parse_filters(data):
+    """Metadata filters from a request body: {"number_min", "number_max", "title"}."""
+    filters = data.get("filters") or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be an object")
+    parsed = {}
+    for key in ("number_min", "number_max"):
+        if filters.get(key) not in (None, ""):
+            parsed[key] = int(filters[key])
+    if filters.get("title"):
+        parsed["title"] = str(filters["title"])
+    return parsed
 
 # ============================================================
 # 💬 Response Generation Logic
 # ============================================================
-def generate_response(memory, context, question, use_context=True, summarize=False):
+def prompt_mode(question):
     q_lower = question.lower()
+    if any(word in q_lower for word in ["question", "quiz", "mcq", "interview"]):
+        return "questions"
+    return "answer"
 
+
+def llm_kind(question, summarize=False):
+    """Admission priority class of a prompt: chat > quiz > summarize."""
+    if summarize:
+        return "summarize"
+    return "quiz" if prompt_mode(question) == "questions" else "chat"
+
+
+def overloaded_response(e: Overloaded):
+    return JSONResponse({"error": "The model is busy, please retry shortly.", "reason": e.reason,
+                         "retry_after": e.retry_after},
+                        status_code=e.status_code, headers={"Retry-After": str(e.retry_after)})
+
+
+def build_prompt(memory, context, question, use_context=True, summarize=False):
     # 🎯 Question mode
-    if any(word in q_lower for word in ["question", "quiz", "mcq", "interview"]):
+    if prompt_mode(question) == "questions":
         prompt = f"""
 You are AppsterGPT — a professional AI by Arpit Kumar Mishra.
 Generate 10–15 relevant questions on: "{question}"
@@ -127,7 +247,36 @@ You are AppsterGPT — a helpful AI by Arpit Kumar Mishra.
 User Question: {question}
 Answer in detail with structure and examples:
 """
-    return query_llm(prompt)
+    return prompt
+
+
+async def generate_response(memory, context, question, use_context=True, summarize=False, session_id=""):
+    with metrics.stage("summarize" if summarize else "generation"):
+        return await query_llm(build_prompt(memory, context, question, use_context, summarize),
+                               session_id, llm_kind(question, summarize))
+
+
+async def summarize_memory(summary, turns):
+    # Over budget: keep the rolling summary and the newest turns, drop the middle
+    memory = trim_memory(summary, turns, SUMMARY_TOKEN_BUDGET)
+    return await generate_response(memory, "", "Summarize memory", summarize=True)
+
+
+# Compacts long session memory in the background (see summarizer.py)
+summarizer = MemorySummarizer(memory_store, summarize_memory)
+
+
+async def stream_llm(prompt: str, session_id="", kind="chat"):
+    """Relay generated tokens; upstream errors are raised to the caller,
+    which must not cache or remember a half-streamed answer."""
+    started = time.perf_counter()
+    first = True
+    with metrics.stage("generation"):
+        async for token in ollama.generate_stream(LLM_MODEL, prompt, session_id, kind):
+            if first:
+                metrics.observe("first_token", time.perf_counter() - started)
+                first = False
+            yield token
 
 
 # ============================================================
@@ -142,6 +291,83 @@ async def home():
     """
 
 
+# ============================================================
+# 💡 Semantic Answer Cache
+# ============================================================
+answer_cache = SemanticAnswerCache()
+
+
+def cache_bypassed(request: Request):
+    flag = request.headers.get("X-Cache-Bypass", "").lower()
+    return flag in ("1", "true", "yes") or "no-cache" in request.headers.get("Cache-Control", "")
+
+
+def answer_key(turn):
+    # Same prompt mode + same retrieved context (question-mode ignores context)
+    mode = prompt_mode(turn["question"])
+    chunks = turn["top_chunks"] if mode == "answer" and turn["use_context"] else []
+    return context_key(mode, chunks)
+
+
+def lookup_answer(request: Request, turn):
+    """Return (cached_answer_or_None, X-Answer-Cache status)."""
+    if turn["embedding"] is None:
+        return None, "miss"
+    if cache_bypassed(request):
+        answer_cache.bypassed += 1
+        return None, "bypass"
+    answer_cache.set_index_version(turn["index_version"])
+    answer = answer_cache.lookup(turn["embedding"], answer_key(turn))
+    return answer, "hit" if answer is not None else "miss"
+
+
+def store_answer(turn, answer):
+    if turn["embedding"] is not None and answer and not answer.startswith("⚠️"):
+        answer_cache.store(turn["embedding"], answer_key(turn), answer)
+
+
+async def prepare_chat(session_id, question, filters=None):
+    summary, turns, _ = await load_memory_timed(session_id)
+    # One index for the whole turn, even if a reload swaps it meanwhile
+    index, index_version = index_manager.index, index_manager.version
+    # Course-scoped questions only score the chunks that match the filters
+    allowed = index.filter_rows(filters) if index is not None else None
+
+    # Lexical fast path: a decisive exact-term match skips the embedding call
+    rows, strong = await retrieve_lexical(question, rows=allowed, index=index) \
+        if LEXICAL_FAST_PATH else ([], False)
+    if strong:
+        emb, use_context = None, True
+    else:
+        # Hybrid RAG retrieval (the query embedding is kept for the answer cache)
+        emb = await create_embedding(question)
+        rows, coverage = await retrieve_top_rows(question, emb=emb, rows=allowed, index=index)
+        max_sim = max((row["similarity"] for row in rows), default=0.0)
+        use_context = max_sim > 0.45 or coverage >= STRONG_COVERAGE
+
+    # Merge neighbouring chunks and fit memory + context into the token budget
+    with metrics.stage("prompt"):
+        memory, context, prompt_stats = fit_prompt_parts(summary, turns, rows, question, use_context,
+                                                         PROMPT_BUDGET)
+    return {
+        "question": question,
+        "memory": memory,
+        "context": context,
+        "use_context": use_context,
+        "top_chunks": [row["text"] for row in rows],
+        "embedding": emb,
+        "prompt_stats": prompt_stats,
+        "index_version": index_version,
+    }
+
+
+async def remember_turn(session_id, question, answer):
+    with metrics.stage("memory_save"):
+        await run_in_threadpool(memory_store.append_turn, session_id, question, answer)
+    # Summarizing long memory happens on the background worker, never inline
+    await summarizer.maybe_schedule(session_id)
+
+
 @app.post("/chat")
 async def chat(request: Request):
     data = await request.json()
@@ -149,48 +375,267 @@ async def chat(request: Request):
     if not question:
         return JSONResponse({"error": "Question is empty"}, status_code=400)
 
-    memory = load_memory()
+    try:
+        filters = parse_filters(data)
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": f"Invalid filters: {e}"}, status_code=400)
 
-    # RAG retrieval
-    top_chunks, max_sim = retrieve_top_chunks(question)
-    context = "\n\n".join(top_chunks)
-    use_context = max_sim > 0.45
+    session_id = get_session_id(request, data)
+    try:
+        # Refuse up front, before embedding / retrieval, if the LLM queue is full
+        ollama.admission.check(session_id, llm_kind(question))
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    turn = await prepare_chat(session_id, question, filters)
+    answer, cache_status = lookup_answer(request, turn)
+    if answer is None:
+        try:
+            answer = await generate_response(turn["memory"], turn["context"], question, turn["use_context"],
+                                             session_id=session_id)
+        except Overloaded as e:
+            return overloaded_response(e)
+        store_answer(turn, answer)
+
+    # Update memory (a failed generation is not a turn worth remembering)
+    if not answer.startswith("⚠️"):
+        await remember_turn(session_id, question, answer)
+
+    return JSONResponse(
+        {"answer": answer, "context_used": turn["use_context"], "context_snippets": turn["top_chunks"][:2],
+         "prompt_tokens": turn["prompt_stats"]["prompt_tokens"]},
+        headers={"X-Answer-Cache": cache_status},
+    )
+
+
+def sse_event(payload):
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """Same as /chat, but relays tokens as server-sent events.
+
+    Each event is `data: {"token": ...}`; the last one is
+    `data: {"done": true, "context_used": ..., "context_snippets": [...]}`,
+    or `data: {"error": ..., "retry_after": ...}` if the request timed out
+    in the LLM queue. If generation breaks off, the done event carries
+    `"failed": true` and the partial answer is not cached or remembered.
+    """
+    data = await request.json()
+    question = data.get("question", "").strip()
+    if not question:
+        return JSONResponse({"error": "Question is empty"}, status_code=400)
 
-    # Summarize memory if large
-    if len(memory.split()) > 1200:
-        summary = generate_response(memory, "", "Summarize memory", summarize=True)
-        memory = summary
-        save_memory(memory)
+    try:
+        filters = parse_filters(data)
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": f"Invalid filters: {e}"}, status_code=400)
 
-    answer = generate_response(memory, context, question, use_context)
+    session_id = get_session_id(request, data)
+    try:
+        ollama.admission.check(session_id, llm_kind(question))
+    except Overloaded as e:
+        return overloaded_response(e)
+
+    turn = await prepare_chat(session_id, question, filters)
+    cached, cache_status = lookup_answer(request, turn)
+    prompt = build_prompt(turn["memory"], turn["context"], question, turn["use_context"])
+
+    async def events():
+        if cached is not None:
+            answer = cached
+            yield sse_event({"token": cached})
+        else:
+            parts = []
+            try:
+                async for token in stream_llm(prompt, session_id, llm_kind(question)):
+                    parts.append(token)
+                    yield sse_event({"token": token})
+            except Overloaded as e:
+                yield sse_event({"error": "The model is busy, please retry shortly.",
+                                 "retry_after": e.retry_after})
+                return
+            except Exception as e:
+                # A truncated answer is neither cached nor saved to memory
+                print("❌ LLM Error:", e)
+                yield sse_event({"token": "⚠️ LLM generation failed."})
+                yield sse_event({"done": True, "failed": True, "context_used": turn["use_context"],
+                                 "context_snippets": turn["top_chunks"][:2]})
+                return
+            answer = "".join(parts).strip()
+            store_answer(turn, answer)
+        await remember_turn(session_id, question, answer)
+        yield sse_event({"done": True, "context_used": turn["use_context"],
+                         "context_snippets": turn["top_chunks"][:2]})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      "X-Answer-Cache": cache_status})
+
+
+@app.post("/retrieve/batch")
+async def retrieve_batch(request: Request):
+    """Top-k chunks for many queries: one embedding call, one GEMM pass.
+
+    Body: `{"queries": ["...", ...], "top_k": 5, "filters": {...}}`;
+    top_k is clamped to 1..MAX_BATCH_TOP_K.
+    """
+    data = await request.json()
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries \
+            or not all(isinstance(q, str) and q.strip() for q in queries):
+        return JSONResponse({"error": "queries must be a non-empty list of non-empty strings"}, status_code=400)
+    queries = [q.strip() for q in queries]
+    top_k = data.get("top_k", 5)
+    if isinstance(top_k, bool) or not isinstance(top_k, int):
+        return JSONResponse({"error": "top_k must be an integer"}, status_code=400)
+    top_k = min(max(top_k, 1), MAX_BATCH_TOP_K)
+    try:
+        filters = parse_filters(data)
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": f"Invalid filters: {e}"}, status_code=400)
+    if len(queries) > MAX_BATCH_QUERIES:
+        return JSONResponse({"error": f"at most {MAX_BATCH_QUERIES} queries per request"}, status_code=400)
+    index = current_index()
+    if index is None:
+        return JSONResponse({"error": "index not loaded"}, status_code=503)
 
-    # Update memory
-    memory += f"\nUser: {question}\nAppsterGPT: {answer}\n"
-    save_memory(memory)
+    try:
+        vectors = await get_client(EMBED_MODEL).aembed_many(queries, ollama)
+    except Exception as e:
+        print("❌ Embedding Error:", e)
+        return JSONResponse({"error": "embedding failed"}, status_code=502)
+    results = await run_in_threadpool(index.top_rows_batch, vectors, top_k, index.filter_rows(filters))
+    return {"results": [{"query": q, "chunks": rows} for q, rows in zip(queries, results)]}
 
-    return {"answer": answer, "context_used": use_context, "context_snippets": top_chunks[:2]}
+
+@app.post("/admin/reload")
+async def reload_index(request: Request):
+    """Reload the index now if its on-disk version changed (`?force=1` always reloads)."""
+    force = request.query_params.get("force", "").lower() in ("1", "true", "yes")
+    reloaded = await index_manager.reload(force=force)
+    return {"reloaded": reloaded, **index_manager.status()}
+
+
+@app.get("/admin/index")
+async def index_status():
+    return index_manager.status()
 
 
 @app.get("/history")
-async def get_history():
-    memory = load_memory()
-    return {"history": memory}
+async def get_history(request: Request):
+    summary, turns, _ = await load_memory_timed(get_session_id(request))
+    return {"history": join_memory(summary, turns)}
 
 
 @app.post("/clear")
-async def clear_memory():
-    save_memory("")
+async def clear_memory(request: Request):
+    await run_in_threadpool(memory_store.clear, get_session_id(request))
     return {"status": "cleared"}
 
 
+@app.get("/stats")
+async def get_stats():
+    return {
+        "embedding_cache": get_client(EMBED_MODEL).cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "summarizer": summarizer.stats(),
+        "uploads": uploader.stats(),
+        "ollama": ollama.stats(),
+    }
+
+
+def cache_metrics():
+    """Point-in-time values for /metrics, read at scrape time."""
+    emb = get_client(EMBED_MODEL).cache.stats()
+    ans = answer_cache.stats()
+    summary = summarizer.stats()
+    index = index_manager.status()
+    llm = ollama.stats()
+    return [
+        ("rag_embedding_cache_requests_total", "counter", "Embedding cache lookups by result",
+         {("memory_hit",): emb["hits_memory"], ("disk_hit",): emb["hits_disk"], ("miss",): emb["misses"]},
+         ("result",)),
+        ("rag_embedding_cache_hit_ratio", "gauge", "Embedding cache hit rate", {(): emb["hit_rate"]}, ()),
+        ("rag_answer_cache_requests_total", "counter", "Answer cache lookups by result",
+         {("hit",): ans["hits"], ("miss",): ans["misses"], ("bypass",): ans["bypassed"]}, ("result",)),
+        ("rag_answer_cache_hit_ratio", "gauge", "Answer cache hit rate", {(): ans["hit_rate"]}, ()),
+        ("rag_answer_cache_entries", "gauge", "Answers held in the cache", {(): ans["entries"]}, ()),
+        ("rag_summarizer_queued", "gauge", "Sessions waiting for summarization", {(): summary["queued"]}, ()),
+        ("rag_summarizer_jobs_total", "counter", "Finished summarization jobs",
+         {("completed",): summary["completed"], ("failed",): summary["failed"]}, ("result",)),
+        ("rag_index_chunks", "gauge", "Chunks in the live index", {(): index["chunks"]}, ()),
+        ("rag_index_reloads_total", "counter", "Hot index reloads", {(): index["reloads"]}, ()),
+        ("rag_ollama_calls_total", "counter", "Ollama calls sent upstream or coalesced into one in flight",
+         {**{(kind, "upstream"): n for kind, n in llm["upstream_calls"].items()},
+          **{(kind, "coalesced"): n for kind, n in llm["coalesced_calls"].items()}}, ("call", "result")),
+        ("rag_llm_slots_active", "gauge", "Generations holding an LLM slot", {(): llm["admission"]["active"]}, ()),
+        ("rag_llm_queued", "gauge", "Generations waiting for an LLM slot",
+         {(kind,): n for kind, n in llm["admission"]["queued_by_kind"].items()}, ("kind",)),
+        ("rag_llm_admitted_total", "counter", "Generations admitted to the LLM",
+         {(kind,): n for kind, n in llm["admission"]["admitted"].items()}, ("kind",)),
+        ("rag_llm_rejected_total", "counter", "Requests refused by admission control",
+         {(reason,): n for reason, n in llm["admission"]["rejected"].items()}, ("reason",)),
+        ("rag_upload_jobs", "gauge", "Upload indexing jobs by status",
+         {(status,): n for status, n in uploader.stats()["jobs"].items()}, ("status",)),
+    ]
+
+
+metrics.add_collector(cache_metrics)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of stage timings, caches and in-flight counts."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
-    filename = file.filename
-    path = os.path.join(UPLOAD_FOLDER, filename)
-    with open(path, "wb") as f:
-        f.write(await file.read())
-    # Optional: extract + embed later
-    return {"uploaded": filename, "path": path}
+    """Save a .txt/.md/.pdf/transcript .json file and queue it for indexing.
+
+    Returns 202 with a job id; poll `GET /upload/{job_id}` for progress.
+    """
+    if not is_supported(file.filename or ""):
+        return JSONResponse({"error": f"unsupported file type (use {', '.join(UPLOAD_EXTENSIONS)})"},
+                            status_code=415)
+    if not store_exists(VECTOR_STORE) and os.path.exists(EMBED_FILE):
+        return JSONResponse({"error": "convert embeddings.joblib to a vector store first "
+                                      "(python vector_store.py)"}, status_code=409)
+
+    job = UploadJob(file.filename, UPLOAD_FOLDER)
+    part_path = job.path + ".part"
+    try:
+        # Copied a block at a time, with the file writes off the event loop
+        with open(part_path, "wb") as f:
+            while block := await file.read(UPLOAD_READ_BYTES):
+                job.size += len(block)
+                if job.size > MAX_UPLOAD_BYTES:
+                    raise ValueError("too large")
+                await run_in_threadpool(f.write, block)
+    except ValueError:
+        os.remove(part_path)
+        return JSONResponse({"error": f"file exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"}, status_code=413)
+    finally:
+        await file.close()
+    os.replace(part_path, job.path)
+
+    uploader.submit(job)
+    return JSONResponse({**job.to_dict(), "status_url": f"/upload/{job.id}"}, status_code=202)
+
+
+@app.get("/upload/{job_id}")
+async def upload_status(job_id: str):
+    job = uploader.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "unknown job"}, status_code=404)
+    return job.to_dict()
+
+
+@app.get("/upload")
+async def list_uploads():
+    return {"jobs": [job.to_dict() for job in reversed(uploader.jobs.values())], **uploader.stats()}
 
 
 # ============================================================
@@ -0,0 +1,155 @@
+import sqlite3
+import threading
+import time
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+MEMORY_DB = "chat_memory.sqlite3"
+RECENT_TURNS = 12          # unsummarized turns included in the prompt
+SUMMARIZE_AFTER_WORDS = 1200
+KEEP_RECENT_TURNS = 4      # turns left verbatim when older ones are folded into the summary
+DEFAULT_SESSION = "default"
+
+
+def format_turn(question, answer):
+    return f"\nUser: {question}\nAppsterGPT: {answer}\n"
+
+
+def count_words(*texts):
+    return sum(len(t.split()) for t in texts)
+
+
+def join_memory(summary, turns):
+    return (summary + turns).strip()
+
+
+# ============================================================
+# 🧠 Session Memory Store
+# ============================================================
+class MemoryStore:
+    """Append-only, per-session conversation memory in SQLite.
+
+    Every turn is one INSERT, so concurrent requests never rewrite each
+    other's history. A session's memory is its rolling summary plus the
+    most recent turns that summary does not cover yet, so a read costs
+    the same no matter how long the conversation has been.
+
+    Each session also keeps a running word count (summary words plus
+    words in uncovered turns), updated per insert/fold, so deciding when
+    to summarize never re-splits the history.
+    """
+
+    def __init__(self, path=MEMORY_DB, recent_turns=RECENT_TURNS):
+        self.path = path
+        self.recent_turns = recent_turns
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT NOT NULL, "
+            "question TEXT NOT NULL, answer TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session, id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "session TEXT PRIMARY KEY, summary TEXT NOT NULL, upto_turn INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+        self._ensure_column("turns", "words", "INTEGER NOT NULL DEFAULT 0")
+        self._ensure_column("summaries", "summary_words", "INTEGER NOT NULL DEFAULT 0")
+        self._ensure_column("summaries", "pending_words", "INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    def _ensure_column(self, table, column, decl):
+        # Databases created before the column existed are upgraded in place
+        columns = {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            self._db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    def append_turn(self, session, question, answer):
+        words = count_words(question, answer)
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO turns (session, question, answer, created, words) VALUES (?, ?, ?, ?, ?)",
+                (session, question, answer, now, words),
+            )
+            self._db.execute(
+                "INSERT INTO summaries (session, summary, upto_turn, updated, pending_words) "
+                "VALUES (?, '', 0, ?, ?) ON CONFLICT(session) DO UPDATE SET "
+                "pending_words = pending_words + excluded.pending_words",
+                (session, now, words),
+            )
+            self._db.commit()
+            return cur.lastrowid
+
+    def word_count(self, session):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary_words + pending_words FROM summaries WHERE session = ?", (session,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def load(self, session):
+        """Return (memory_text, last_turn_id) for the prompt."""
+        summary, turns, last_id = self.load_parts(session)
+        return join_memory(summary, turns), last_id
+
+    def load_parts(self, session):
+        """Return (summary, recent_turns_text, last_turn_id), kept apart so
+        the summary can be budgeted without re-parsing the joined text."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, upto_turn FROM summaries WHERE session = ?", (session,)
+            ).fetchone()
+            summary, upto = row if row else ("", 0)
+            turns = self._db.execute(
+                "SELECT id, question, answer FROM turns WHERE session = ? AND id > ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session, upto, self.recent_turns),
+            ).fetchall()
+        turns.reverse()
+        last_id = turns[-1][0] if turns else upto
+        return summary, "".join(format_turn(q, a) for _, q, a in turns), last_id
+
+    def turns_to_fold(self, session, keep_recent=KEEP_RECENT_TURNS):
+        """Return (summary, upto_turn, turns) where turns are the uncovered
+        (id, question, answer, words) rows older than the last keep_recent."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary, upto_turn FROM summaries WHERE session = ?", (session,)
+            ).fetchone()
+            summary, upto = row if row else ("", 0)
+            turns = self._db.execute(
+                "SELECT id, question, answer, words FROM turns WHERE session = ? AND id > ? ORDER BY id",
+                (session, upto),
+            ).fetchall()
+        return summary, upto, turns[:max(len(turns) - keep_recent, 0)]
+
+    def fold_summary(self, session, summary, expected_upto, upto_turn, folded_words):
+        """Replace the summary so it covers turns <= upto_turn.
+
+        Only applies if nobody else moved the summary since it was read
+        (expected_upto) and the folded turns still exist; returns False
+        otherwise. Turn ids are never reused (AUTOINCREMENT), so a session
+        cleared mid-fold, even one with new turns since, is never handed
+        the old conversation's summary.
+        """
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE summaries SET summary = ?, upto_turn = ?, updated = ?, summary_words = ?, "
+                "pending_words = MAX(pending_words - ?, 0) WHERE session = ? AND upto_turn = ? "
+                "AND EXISTS (SELECT 1 FROM turns WHERE session = ? AND id = ?)",
+                (summary.strip(), upto_turn, time.time(), count_words(summary), folded_words,
+                 session, expected_upto, session, upto_turn),
+            )
+            self._db.commit()
+            return cur.rowcount == 1
+
+    def clear(self, session):
+        with self._lock:
+            self._db.execute("DELETE FROM turns WHERE session = ?", (session,))
+            self._db.execute("DELETE FROM summaries WHERE session = ?", (session,))
+            self._db.commit()
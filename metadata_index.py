@@ -0,0 +1,70 @@
+import re
+
+import numpy as np
+
+NUMBER_RE = re.compile(r"\d+")
+FILTER_KEYS = ("number_min", "number_max", "title")
+
+
+def parse_number(value):
+    """Video number as an int ("004" -> 4); -1 when there is none."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    match = NUMBER_RE.search(str(value or ""))
+    return int(match.group()) if match else -1
+
+
+# ============================================================
+# 🏷️ Metadata Posting Lists
+# ============================================================
+class MetadataIndex:
+    """Row ids grouped by video number and by title, built once at load.
+
+    Rows are kept sorted by video number, so a number range is two binary
+    searches and one contiguous slice. Each distinct title owns a posting
+    list of row ids; a title substring is matched against the (few)
+    distinct titles, not the rows. Filters return sorted row ids, so only
+    those rows of the embedding matrix need to be scored.
+    """
+
+    def __init__(self, numbers, titles):
+        self.n_rows = len(numbers)
+        values = np.fromiter((parse_number(n) for n in numbers), dtype=np.int64, count=self.n_rows)
+        self.by_number = np.argsort(values, kind="stable")
+        self.sorted_numbers = values[self.by_number]
+        postings = {}
+        for row, title in enumerate(titles or []):
+            if title is None:
+                continue  # untitled rows never match a title filter
+            postings.setdefault(str(title), []).append(row)
+        self.titles = {t: np.asarray(rows, dtype=np.int64) for t, rows in postings.items()}
+
+    @classmethod
+    def from_meta(cls, meta):
+        if "number" not in meta:
+            return None
+        return cls(meta["number"], meta.get("title"))
+
+    def number_rows(self, number_min=None, number_max=None):
+        # Unnumbered rows (-1) sort first and never match a range
+        lo = np.searchsorted(self.sorted_numbers, 0 if number_min is None else max(int(number_min), 0), "left")
+        hi = len(self.sorted_numbers) if number_max is None else \
+            np.searchsorted(self.sorted_numbers, int(number_max), "right")
+        return np.sort(self.by_number[lo:hi])
+
+    def title_rows(self, title):
+        needle = title.lower()
+        lists = [rows for t, rows in self.titles.items() if needle in t.lower()]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(lists))
+
+    def rows(self, number_min=None, number_max=None, title=None):
+        """Sorted row ids matching every given filter (None = no filter)."""
+        selected = None
+        if number_min is not None or number_max is not None:
+            selected = self.number_rows(number_min, number_max)
+        if title:
+            matched = self.title_rows(title)
+            selected = matched if selected is None else np.intersect1d(selected, matched, assume_unique=True)
+        return selected
@@ -0,0 +1,231 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+# Seconds; spans sub-millisecond retrieval up to multi-minute generations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+NAMESPACE = "rag"
+
+# Per-request {stage: seconds}, filled by `stage()` and sent as Server-Timing
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ============================================================
+# 📈 Metric Types (Prometheus text format)
+# ============================================================
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self.series.items()):
+                running = 0
+                for bound, n in zip(self.buckets, counts):
+                    running += n
+                    le = _labels(self.labels + ("le",), labels + (_number(bound),))
+                    lines.append(f"{self.name}_bucket{le} {running}")
+                le = _labels(self.labels + ("le",), labels + ("+Inf",))
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            return [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+# ============================================================
+# ⏱️ Stage Timing Registry
+# ============================================================
+class Metrics:
+    """Stage histograms, request counters and in-flight gauges for the API.
+
+    `stage(name)` times one step of a request (embedding, retrieval,
+    generation, memory I/O...). The duration goes into a histogram and,
+    when called inside `request()`, into that request's Server-Timing
+    header. Point-in-time values (cache hit rates, queue sizes) are pulled
+    from `collectors` when `/metrics` is scraped rather than pushed on the
+    hot path.
+    """
+
+    def __init__(self, namespace=NAMESPACE):
+        ns = namespace
+        self.stage_seconds = Histogram(f"{ns}_stage_seconds", "Time spent in each request stage", ("stage",))
+        self.stage_errors = Counter(f"{ns}_stage_errors_total", "Stages that raised", ("stage",))
+        self.stages_in_flight = Gauge(f"{ns}_stage_in_flight", "Stages currently running", ("stage",))
+        self.request_seconds = Histogram(f"{ns}_request_seconds", "HTTP request latency",
+                                         ("method", "path"))
+        self.requests = Counter(f"{ns}_requests_total", "HTTP requests served", ("method", "path", "status"))
+        self.requests_in_flight = Gauge(f"{ns}_requests_in_flight", "HTTP requests being served")
+        self.metrics = [self.stage_seconds, self.stage_errors, self.stages_in_flight,
+                        self.request_seconds, self.requests, self.requests_in_flight]
+        self.collectors = []  # () -> [(name, kind, help, {label_tuple: value}, label_names)]
+
+    def observe(self, name, seconds):
+        self.stage_seconds.observe(seconds, name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        self.stages_in_flight.inc(name)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.stage_errors.inc(name)
+            raise
+        finally:
+            self.stages_in_flight.dec(name)
+            self.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def request(self):
+        """Collect stage timings for one HTTP request; yields the timings dict."""
+        timings = {}
+        token = _request_timings.set(timings)
+        self.requests_in_flight.inc()
+        try:
+            yield timings
+        finally:
+            self.requests_in_flight.dec()
+            _request_timings.reset(token)
+
+    def finish_request(self, method, path, status, seconds):
+        self.request_seconds.observe(seconds, method, path)
+        self.requests.inc(method, path, str(status))
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+            lines += metric.render()
+        for collect in self.collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"❌ Metrics Collector Error: {e}")
+                continue
+            for name, kind, help, values, label_names in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_labels(label_names, k)} {_number(v)}" for k, v in sorted(values.items())]
+        return "\n".join(lines) + "\n"
+
+
+def server_timing(timings):
+    """Format {stage: seconds} as a Server-Timing header value (milliseconds)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+# ============================================================
+# 🌐 ASGI Middleware
+# ============================================================
+class MetricsMiddleware:
+    """Times every HTTP request and adds a Server-Timing header.
+
+    The header is written when the response starts, so for streamed
+    responses it covers the stages that ran before the first byte
+    (retrieval, prompt building); generation time still reaches the
+    histograms. Requests are labelled by route template, not raw path.
+    """
+
+    def __init__(self, app, metrics, skip=("/metrics",)):
+        self.app = app
+        self.metrics = metrics
+        self.skip = set(skip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings["total"] = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with self.metrics.request() as timings:
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "unmatched"
+                self.metrics.finish_request(scope["method"], path, status, time.perf_counter() - started)
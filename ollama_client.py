@@ -0,0 +1,211 @@
+import asyncio
+import json
+import os
+
+import httpx
+import numpy as np
+
+from admission import AdmissionController
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api")
+MAX_CONNECTIONS = 32
+MAX_GENERATIONS = 4      # concurrent /generate calls allowed upstream
+MAX_EMBEDDINGS = 16      # concurrent /embed calls allowed upstream
+CONNECT_TIMEOUT = 5.0
+EMBED_TIMEOUT = 60.0
+GENERATE_TIMEOUT = 300.0
+
+
+# ============================================================
+# 🌐 Async Ollama Client
+# ============================================================
+class _StreamFlight:
+    """One upstream token stream shared by every caller that joined it."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.readers = 0
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def publish(self, part=None, error=None, done=False):
+        if part is not None:
+            self.parts.append(part)
+        self.error = error
+        self.done = done
+        # Wake everyone waiting, then re-arm for the next part
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class AsyncOllamaClient:
+    """Non-blocking Ollama client for the FastAPI event loop.
+
+    One pooled httpx.AsyncClient is shared by every request. A semaphore
+    caps in-flight embeddings, and generations take a slot from an
+    AdmissionController (bounded pool, prioritized per-session fair
+    queue, fast Overloaded rejection), so a burst queues here instead of
+    piling onto the local model.
+
+    Identical concurrent calls are coalesced (single-flight): while an
+    embed / generate for the same (model, input) is in flight, later
+    callers wait for it instead of sending their own request. Streamed
+    generations are fanned out, so a caller joining late replays the
+    tokens produced so far and then follows the live stream.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, max_connections=MAX_CONNECTIONS,
+                 max_generations=MAX_GENERATIONS, max_embeddings=MAX_EMBEDDINGS, coalesce=True):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_generations = max_generations
+        self.max_embeddings = max_embeddings
+        self.coalesce = coalesce
+        self.admission = AdmissionController(max_generations)
+        self.upstream_calls = {"embed": 0, "generate": 0, "generate_stream": 0}
+        self.coalesced_calls = {"embed": 0, "generate": 0, "generate_stream": 0}
+        self._inflight = {}
+        self._http = None
+        self._embed_slots = None
+
+    def _client(self):
+        # Created lazily so the pool and semaphores bind to the running loop
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(GENERATE_TIMEOUT, connect=CONNECT_TIMEOUT),
+            )
+            self._embed_slots = asyncio.Semaphore(self.max_embeddings)
+        return self._http
+
+    # --------------------------
+    # 🔗 Single-Flight Coalescing
+    # --------------------------
+    async def _single_flight(self, kind, key, call):
+        """Run `call()` once for all concurrent callers with the same key."""
+        if not self.coalesce:
+            self.upstream_calls[kind] += 1
+            return await call()
+        key = (kind,) + key
+        task = self._inflight.get(key)
+        if task is None:
+            self.upstream_calls[kind] += 1
+            task = asyncio.create_task(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced_calls[kind] += 1
+        # Shielded: one caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every caller gave up
+
+    async def embed(self, model, texts):
+        texts = list(texts)
+        result = await self._single_flight("embed", (model, tuple(texts)),
+                                           lambda: self._embed(model, texts))
+        return result.copy()  # callers may normalize in place
+
+    async def _embed(self, model, texts):
+        http = self._client()
+        async with self._embed_slots:
+            res = await http.post("/embed", json={"model": model, "input": texts},
+                                  timeout=EMBED_TIMEOUT)
+        res.raise_for_status()
+        return np.asarray(res.json()["embeddings"], dtype=np.float32)
+
+    async def generate(self, model, prompt, session_id="", kind="chat"):
+        # Coalesced callers ride on the first caller's admission slot
+        return await self._single_flight("generate", (model, prompt),
+                                         lambda: self._generate(model, prompt, session_id, kind))
+
+    async def _generate(self, model, prompt, session_id, kind):
+        http = self._client()
+        async with self.admission.slot(session_id, kind):
+            res = await http.post("/generate", json={"model": model, "prompt": prompt, "stream": False})
+        res.raise_for_status()
+        return res.json().get("response", "").strip()
+
+    async def generate_stream(self, model, prompt, session_id="", kind="chat"):
+        """Yield response fragments as Ollama produces them (NDJSON stream)."""
+        if not self.coalesce:
+            self.upstream_calls["generate_stream"] += 1
+            async for part in self._generate_stream(model, prompt, session_id, kind):
+                yield part
+            return
+
+        key = ("generate_stream", model, prompt)
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.upstream_calls["generate_stream"] += 1
+            flight = self._inflight[key] = _StreamFlight()
+            flight.task = asyncio.create_task(self._pump(key, flight, model, prompt, session_id, kind))
+        else:
+            self.coalesced_calls["generate_stream"] += 1
+
+        flight.readers += 1
+        try:
+            sent = 0
+            while True:
+                changed = flight.changed
+                while sent < len(flight.parts):
+                    yield flight.parts[sent]
+                    sent += 1
+                if flight.error is not None:
+                    raise flight.error
+                if flight.done:
+                    return
+                await changed.wait()
+        finally:
+            flight.readers -= 1
+            if flight.readers == 0 and not flight.done:
+                # Every listener went away: stop generating for nobody
+                flight.task.cancel()
+
+    async def _pump(self, key, flight, model, prompt, session_id, kind):
+        # Feeds one upstream stream into a flight; new callers stop joining once it ends
+        try:
+            async for part in self._generate_stream(model, prompt, session_id, kind):
+                flight.publish(part)
+            self._inflight.pop(key, None)
+            flight.publish(done=True)
+        except asyncio.CancelledError:
+            self._inflight.pop(key, None)
+            flight.publish(error=RuntimeError("generation cancelled"), done=True)
+        except Exception as e:
+            self._inflight.pop(key, None)
+            flight.publish(error=e, done=True)
+
+    async def _generate_stream(self, model, prompt, session_id, kind):
+        http = self._client()
+        async with self.admission.slot(session_id, kind):
+            async with http.stream("POST", "/generate",
+                                   json={"model": model, "prompt": prompt, "stream": True}) as res:
+                res.raise_for_status()
+                async for line in res.aiter_lines():
+                    if not line:
+                        continue
+                    part = json.loads(line)
+                    if part.get("response"):
+                        yield part["response"]
+                    if part.get("done"):
+                        break
+
+    def stats(self):
+        return {"upstream_calls": dict(self.upstream_calls), "coalesced_calls": dict(self.coalesced_calls),
+                "in_flight": len(self._inflight), "admission": self.admission.stats()}
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
@@ -1,7 +1,13 @@
+# Import argparse to read command-line options
+import argparse
 # Import the os module for file and directory operations
 import os
 # Import subprocess module to run external commands
 import subprocess
+# Import time to measure throughput
+import time
+# Import a thread pool: each worker just waits on its own ffmpeg process
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ✅ Define input/output folders
 # Set the path to the directory containing video files
@@ -9,52 +15,150 @@ video_folder = "/Users/arpitmishra/Desktop/Walmart Sales Forecast/RAG-Based-AI/v
 # Set the path to the directory where audio files will be saved
 audio_folder = "/Users/arpitmishra/Desktop/Walmart Sales Forecast/RAG-Based-AI/audio"
 
-# ✅ Create output folder if it doesn't exist
-# Create the audio folder if it doesn't exist, without raising an error if it already exists
-os.makedirs(audio_folder, exist_ok=True)
-
-# ✅ Get all video files
-# Get a list of all files in the video folder
-files = os.listdir(video_folder)
-
-# Iterate through each file in the video folder
-for file in files:
-    # Try to process each file, handling potential errors
-    try:
-        # ✅ Extract tutorial number and file name safely
-        # Extract the tutorial number from the filename (format: "XXX - Title #N")
-        tutorial_number = file.split(" [")[0].split(" #")[1]
-        # Extract the main title of the file (before the "｜" character)
-        file_name = file.split(" ｜ ")[0]
-
-        # Print the extracted tutorial number and file name for debugging
-        print(tutorial_number, file_name)
-
-        # ✅ Convert video to MP3
-        # Create the full path to the input video file
+# ✅ Encoding profiles
+PROFILES = {
+    # Speech-to-text only needs mono 16kHz (what whisper resamples to anyway)
+    "speech": ["-ac", "1", "-ar", "16000", "-ab", "32k"],
+    # The original CD-quality stereo encode
+    "music": ["-ab", "192k", "-ar", "44100"],
+}
+# Default profile for the transcription pipeline
+DEFAULT_PROFILE = "speech"
+# mp3s made before profiles were recorded used the original encode
+LEGACY_PROFILE = "music"
+# ffmpeg is single-threaded for mp3, so one process per core keeps them all busy
+WORKERS = os.cpu_count() or 1
+
+
+# ✅ Work out the output name for one video
+def output_name(file):
+    # Extract the tutorial number from the filename (format: "XXX - Title #N")
+    tutorial_number = file.split(" [")[0].split(" #")[1]
+    # Extract the main title of the file (before the "｜" character)
+    file_name = file.split(" ｜ ")[0]
+    # Formatted name that transcribe.py parses back into (number, title)
+    return f"{tutorial_number} - {file_name}.mp3"
+
+
+# ✅ The profile each mp3 was encoded with sits next to it in "<name>.mp3.profile"
+def profile_path(output_path):
+    return output_path + ".profile"
+
+
+def recorded_profile(output_path):
+    # No sidecar: the mp3 predates profiles, so it is the original music encode
+    if not os.path.exists(profile_path(output_path)):
+        return LEGACY_PROFILE
+    with open(profile_path(output_path), "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+# ✅ Skip outputs that are newer than their input and used the same profile
+def is_up_to_date(input_path, output_path, profile):
+    # Nothing to skip if the mp3 was never made
+    if not os.path.exists(output_path):
+        return False
+    # Switching profiles re-encodes, even if the video is unchanged
+    if recorded_profile(output_path) != profile:
+        return False
+    # Re-encode only when the video changed after the mp3 was written
+    return os.path.getmtime(output_path) >= os.path.getmtime(input_path)
+
+
+# ✅ Convert one video to MP3
+def convert(input_path, output_path, profile):
+    # Encode to a temporary name so an interrupted run never looks finished
+    tmp_path = output_path + ".part"
+    # Run ffmpeg command to convert video to audio
+    result = subprocess.run([
+        # Command to execute, quiet apart from errors, never waiting on stdin
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        # Input file parameter
+        "-i", input_path,
+        # Disable video stream in output
+        "-vn",
+        # Bitrate / sample rate / channels for the chosen profile
+        *PROFILES[profile],
+        # Overwrite a leftover temp file; the format can't be guessed from ".part"
+        "-y", "-f", "mp3",
+        # Output file path
+        tmp_path,
+    ], capture_output=True, text=True)
+    # Report ffmpeg's own error message if the encode failed
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "ffmpeg failed")
+    # Publish the finished file in one step
+    os.replace(tmp_path, output_path)
+    # Record the profile only after the mp3 is in place, so a crash re-encodes
+    with open(profile_path(output_path), "w", encoding="utf-8") as f:
+        f.write(profile)
+    # Size of the result, for the throughput summary
+    return os.path.getsize(output_path)
+
+
+# ✅ Convert a whole folder with a bounded pool of ffmpeg workers
+def convert_folder(video_folder, audio_folder, profile=DEFAULT_PROFILE, workers=WORKERS, force=False):
+    # Create the audio folder if it doesn't exist, without raising an error if it already exists
+    os.makedirs(audio_folder, exist_ok=True)
+
+    # Collect the (input, output) pairs that actually need encoding
+    jobs, skipped = [], 0
+    # Iterate through each file in the video folder
+    for file in sorted(os.listdir(video_folder)):
+        # Try to name each file, handling names that don't match the pattern
+        try:
+            name = output_name(file)
+        # Handle the case where the filename format doesn't match expected pattern
+        except IndexError:
+            # Print a warning message for files that couldn't be processed
+            print(f"⚠️ Skipped: {file} (naming format not matched)")
+            continue
+        # Create the full input / output paths
         input_path = os.path.join(video_folder, file)
-        # Create the full path for the output audio file with formatted name
-        output_path = os.path.join(audio_folder, f"{tutorial_number} - {file_name}.mp3")
-
-        # Run ffmpeg command to convert video to audio
-        subprocess.run([
-            # Command to execute
-            "ffmpeg",
-            # Input file parameter
-            "-i", input_path,
-            # Disable video stream in output
-            "-vn",               # disable video
-            # Set audio bitrate to 192kbps
-            "-ab", "192k",       # set audio bitrate
-            # Set audio sample rate to 44.1kHz (CD quality)
-            "-ar", "44100",      # set sample rate
-            # Overwrite output file if it already exists
-            "-y",                # overwrite if exists
-            # Output file path
-            output_path
-        ])
-
-    # Handle the case where the filename format doesn't match expected pattern
-    except IndexError:
-        # Print a warning message for files that couldn't be processed
-        print(f"⚠️ Skipped: {file} (naming format not matched)")
+        output_path = os.path.join(audio_folder, name)
+        # Reuse mp3s that are already up to date unless forced
+        if not force and is_up_to_date(input_path, output_path, profile):
+            skipped += 1
+            continue
+        jobs.append((input_path, output_path))
+
+    print(f"🎞️ {len(jobs)} videos to convert, {skipped} up to date ({profile} profile, {workers} workers)")
+
+    # Run the encodes in parallel and tally the results
+    started = time.perf_counter()
+    converted = failed = in_bytes = out_bytes = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(convert, i, o, profile): (i, o) for i, o in jobs}
+        for future in as_completed(futures):
+            input_path, output_path = futures[future]
+            try:
+                out_bytes += future.result()
+                in_bytes += os.path.getsize(input_path)
+                converted += 1
+                # Print the finished file for progress
+                print(f"✅ {os.path.basename(output_path)}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ ffmpeg Error ({os.path.basename(input_path)}): {e}")
+
+    # ✅ Throughput summary
+    elapsed = time.perf_counter() - started
+    mb_in, mb_out = in_bytes / 1e6, out_bytes / 1e6
+    rate = mb_in / elapsed if elapsed > 0 else 0.0
+    print(f"📋 Converted {converted} files ({mb_in:.1f} MB video → {mb_out:.1f} MB audio) "
+          f"in {elapsed:.1f}s — {rate:.1f} MB/s, {skipped} skipped, {failed} failed")
+    return converted, skipped, failed
+
+
+if __name__ == "__main__":
+    # Command-line options (defaults are the folders above)
+    parser = argparse.ArgumentParser(description="Convert tutorial videos to mp3 for transcription")
+    parser.add_argument("--videos", default=video_folder)
+    parser.add_argument("--audio", default=audio_folder)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--force", action="store_true", help="re-encode even if the mp3 is up to date")
+    args = parser.parse_args()
+    convert_folder(args.videos, args.audio, args.profile, args.workers, args.force)
@@ -0,0 +1,154 @@
+import re
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+PROMPT_TOKEN_BUDGET = 3000     # memory + context + question; llama3 has 8k, the rest is for the answer
+MEMORY_SHARE = 0.35            # memory may take this much before context is packed
+SUMMARY_TOKEN_BUDGET = 4000    # input cap for background summarization
+MIN_PARTIAL_TOKENS = 60        # don't add a truncated passage smaller than this
+MAX_OVERLAP_WORDS = 60
+
+# Words and single punctuation marks: close to BPE counts for English prose
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    return len(TOKEN_RE.findall(text))
+
+
+def truncate_tokens(text, budget, keep="head"):
+    """Cut text to roughly `budget` tokens on word boundaries."""
+    if count_tokens(text) <= budget:
+        return text
+    words = text.split()
+    kept, used = [], 1  # the ellipsis marker counts as one token
+    for word in (words if keep == "head" else reversed(words)):
+        cost = count_tokens(word)
+        if used + cost > budget:
+            break
+        kept.append(word)
+        used += cost
+    if keep == "head":
+        return " ".join(kept) + " …"
+    return "… " + " ".join(reversed(kept))
+
+
+# ============================================================
+# 🧱 Context Packing
+# ============================================================
+def _overlap(a, b):
+    """Number of words at the end of `a` that repeat at the start of `b`."""
+    a_words, b_words = a.split(), b.split()
+    for n in range(min(len(a_words), len(b_words), MAX_OVERLAP_WORDS), 0, -1):
+        if a_words[-n:] == b_words[:n]:
+            return n
+    return 0
+
+
+def merge_passages(rows):
+    """Collapse retrieved chunks into passages.
+
+    Exact duplicates are dropped. Chunks from the same video with
+    consecutive chunk ids become one passage, with any words repeated
+    across the boundary removed. Each passage keeps its best score.
+    """
+    seen = set()
+    unique = []
+    for row in rows:
+        if row["text"] in seen:
+            continue
+        seen.add(row["text"])
+        unique.append(row)
+
+    mergeable = [r for r in unique if r.get("number") is not None and isinstance(r.get("chunk_id"), int)]
+    passages = [{"text": r["text"], "score": r.get("score") or 0.0, "rows": [r]}
+                for r in unique if r not in mergeable]
+
+    mergeable.sort(key=lambda r: (str(r["number"]), r["chunk_id"]))
+    current = None
+    for row in mergeable:
+        adjacent = (current is not None and current["number"] == row["number"]
+                    and row["chunk_id"] == current["last_id"] + 1)
+        if adjacent:
+            words = row["text"].split()
+            tail = " ".join(words[_overlap(current["text"], row["text"]):])
+            current["text"] = f"{current['text']} {tail}".strip()
+            current["last_id"] = row["chunk_id"]
+            current["score"] = max(current["score"], row.get("score") or 0.0)
+            current["rows"].append(row)
+            continue
+        current = {"text": row["text"], "score": row.get("score") or 0.0, "rows": [row],
+                   "number": row["number"], "last_id": row["chunk_id"]}
+        passages.append(current)
+
+    passages.sort(key=lambda p: p["score"], reverse=True)
+    return passages
+
+
+def pack_context(rows, budget):
+    """Best-scoring passages first, until `budget` tokens are used.
+
+    Returns (context_text, tokens_used).
+    """
+    parts, used = [], 0
+    for passage in merge_passages(rows):
+        cost = count_tokens(passage["text"])
+        if used + cost <= budget:
+            parts.append(passage["text"])
+            used += cost
+            continue
+        remaining = budget - used
+        if remaining >= MIN_PARTIAL_TOKENS:
+            text = truncate_tokens(passage["text"], remaining)
+            parts.append(text)
+            used += count_tokens(text)
+        break
+    return "\n\n".join(parts), used
+
+
+# ============================================================
+# 🧠 Memory Trimming
+# ============================================================
+def trim_memory(summary, turns, budget):
+    """Fit the rolling summary plus the recent turns into `budget` tokens,
+    keeping the summary head and the most recent turns (older turns in the
+    middle go first). Returns the memory text for the prompt."""
+    summary, turns = summary.strip(), turns.strip()
+    if count_tokens(summary) + count_tokens(turns) <= budget:
+        return f"{summary}\n{turns}".strip()
+    summary = truncate_tokens(summary, budget // 2) if summary else ""
+    remaining = budget - count_tokens(summary)
+    recent = truncate_tokens(turns, remaining, keep="tail") if remaining > 0 else ""
+    return f"{summary}\n{recent}".strip()
+
+
+# ============================================================
+# 📐 Budgeted Assembly
+# ============================================================
+def fit_prompt_parts(summary, turns, rows, question, use_context=True, budget=PROMPT_TOKEN_BUDGET,
+                     template_tokens=60):
+    """Split the token budget between memory and retrieved context.
+
+    Memory (the rolling summary and the recent turns, see trim_memory)
+    is first capped at MEMORY_SHARE of what the question and
+    template leave; context is packed into the rest, and any context
+    budget left unused is handed back to memory.
+    Returns (memory, context, stats).
+    """
+    available = max(budget - template_tokens - count_tokens(question), 0)
+    memory_tokens = count_tokens(summary) + count_tokens(turns)
+    memory_cap = min(memory_tokens, int(available * MEMORY_SHARE))
+
+    context, context_tokens = "", 0
+    if use_context and rows:
+        context, context_tokens = pack_context(rows, available - memory_cap)
+
+    memory = trim_memory(summary, turns, available - context_tokens)
+    memory_used = count_tokens(memory)
+    return memory, context, {
+        "prompt_tokens": template_tokens + count_tokens(question) + memory_used + context_tokens,
+        "memory_tokens": memory_used,
+        "context_tokens": context_tokens,
+        "budget": budget,
+    }
@@ -0,0 +1,253 @@
+import argparse
+import os
+
+import numpy as np
+
+from retrieval_index import top_k_indices
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+CODES_FILE = "codes.npz"
+RERANK_FACTOR = 10         # float32 re-rank covers top_k * RERANK_FACTOR candidates
+MIN_RERANK = 50
+PQ_SUBSPACES = 64          # 1024-d bge-m3 -> 16 dims per subspace, 64 bytes/vector
+PQ_CENTROIDS = 256         # one uint8 code per subspace
+KMEANS_ITERS = 15
+TRAIN_POINTS = 65536
+ENCODE_BLOCK = 65536
+SCAN_BLOCK = 4096          # rows decoded per step at query time (stays in cache)
+
+
+def rerank_size(top_k):
+    return max(top_k * RERANK_FACTOR, MIN_RERANK)
+
+
+# ============================================================
+# 🔢 int8 Scalar Quantization (4x smaller)
+# ============================================================
+class Int8Quantizer:
+    """Symmetric per-dimension int8 codes: x ~= codes * scale."""
+
+    kind = "int8"
+
+    def __init__(self, scale, codes=None):
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.codes = codes
+
+    @classmethod
+    def train(cls, matrix):
+        peak = np.zeros(matrix.shape[1], dtype=np.float32)
+        for start in range(0, len(matrix), ENCODE_BLOCK):
+            block = np.abs(np.asarray(matrix[start:start + ENCODE_BLOCK], dtype=np.float32))
+            np.maximum(peak, block.max(axis=0), out=peak)
+        peak[peak == 0] = 1.0
+        return cls(peak / 127.0)
+
+    def encode(self, matrix, first=0):
+        codes = np.empty((len(matrix) - first, matrix.shape[1]), dtype=np.int8)
+        for start in range(first, len(matrix), ENCODE_BLOCK):
+            block = np.asarray(matrix[start:start + ENCODE_BLOCK], dtype=np.float32)
+            codes[start - first:start - first + len(block)] = np.clip(np.rint(block / self.scale), -127, 127)
+        return codes
+
+    def scores(self, query):
+        # Fold the scale into the query so the scan is one product per block
+        q = query * self.scale
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCAN_BLOCK):
+            out[start:start + SCAN_BLOCK] = self.codes[start:start + SCAN_BLOCK].astype(np.float32) @ q
+        return out
+
+    def arrays(self):
+        return {"scale": self.scale}
+
+
+# ============================================================
+# 🧩 Product Quantization with ADC (dim*4 / m times smaller)
+# ============================================================
+def _kmeans_l2(points, k, iters, rng):
+    centroids = points[rng.choice(len(points), k, replace=len(points) < k)].copy()
+    for _ in range(iters):
+        labels = np.argmin((centroids ** 2).sum(1) - 2 * points @ centroids.T, axis=1)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        starts = (np.cumsum(counts) - counts)[filled]
+        sums = np.add.reduceat(points[np.argsort(labels, kind="stable")], starts, axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        centroids[~filled] = points[rng.choice(len(points), int((~filled).sum()))]
+    return centroids
+
+
+class ProductQuantizer:
+    """Split vectors into m subspaces, each coded by one of 256 centroids.
+
+    Scoring is asymmetric (ADC): the float32 query builds an (m, 256)
+    lookup table of partial inner products, and each row's score is the
+    sum of m table entries picked by its codes.
+    """
+
+    kind = "pq"
+
+    def __init__(self, codebooks, codes=None):
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)  # (m, 256, dsub)
+        self.codes = codes
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def train(cls, matrix, m=PQ_SUBSPACES, seed=0):
+        dim = matrix.shape[1]
+        while dim % m:
+            m -= 1  # fall back to the largest subspace count that divides dim
+        rng = np.random.default_rng(seed)
+        n_train = min(len(matrix), TRAIN_POINTS)
+        sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), n_train, replace=False))],
+                            dtype=np.float32).reshape(n_train, m, dim // m)
+        codebooks = np.stack([
+            _kmeans_l2(sample[:, j], PQ_CENTROIDS, KMEANS_ITERS, rng) for j in range(m)
+        ])
+        return cls(codebooks)
+
+    def encode(self, matrix, first=0):
+        n, dim = matrix.shape
+        dsub = dim // self.m
+        codes = np.empty((n - first, self.m), dtype=np.uint8)
+        norms = (self.codebooks ** 2).sum(-1)
+        for start in range(first, n, ENCODE_BLOCK):
+            block = np.asarray(matrix[start:start + ENCODE_BLOCK], dtype=np.float32)
+            block = block.reshape(len(block), self.m, dsub)
+            for j in range(self.m):
+                dist = norms[j] - 2 * block[:, j] @ self.codebooks[j].T
+                codes[start - first:start - first + len(block), j] = np.argmin(dist, axis=1)
+        return codes
+
+    def scores(self, query):
+        lut = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.m, -1))
+        subspaces = np.arange(self.m)
+        out = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCAN_BLOCK):
+            block = self.codes[start:start + SCAN_BLOCK]
+            out[start:start + len(block)] = lut[subspaces, block].sum(axis=1)
+        return out
+
+    def arrays(self):
+        return {"codebooks": self.codebooks}
+
+
+QUANTIZERS = {q.kind: q for q in (Int8Quantizer, ProductQuantizer)}
+
+
+# ============================================================
+# 🔍 Search on Codes + float32 Re-rank
+# ============================================================
+def search_quantized(quantizer, matrix, query, top_k=5, live=None):
+    """Shortlist with compressed codes, then re-score the shortlist exactly.
+
+    Only the shortlisted rows of `matrix` are touched, so with an mmap
+    store the float32 vectors stay on disk and only the codes live in RAM.
+    Rows with `live` False (deleted) are never shortlisted.
+    """
+    scores = quantizer.scores(query)
+    if live is not None:
+        scores[~live] = -np.inf
+    candidates = top_k_indices(scores, rerank_size(top_k))
+    if live is not None:
+        candidates = candidates[live[candidates]]
+    candidates.sort()
+    scores = matrix[candidates] @ query
+    idx = top_k_indices(scores, top_k)
+    return candidates[idx], scores[idx]
+
+
+# ============================================================
+# 💾 Persistence (next to the vector store)
+# ============================================================
+def save_quantizer(store_path, quantizer, store_version, segments=None):
+    path = os.path.join(store_path, CODES_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, kind=quantizer.kind, codes=quantizer.codes, store_version=np.int64(store_version),
+                 segments=np.array(segments or [], dtype=str), **quantizer.arrays())
+    os.replace(tmp, path)
+
+
+def _read_codes(store_path):
+    """(quantizer, store_version, segments) as persisted, or None without a codes file."""
+    path = os.path.join(store_path, CODES_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        kind = str(data["kind"])
+        params = {k: data[k] for k in data.files if k not in ("kind", "codes", "store_version", "segments")}
+        # Files written before segments were recorded can only be rebuilt
+        segments = data["segments"].tolist() if "segments" in data.files else None
+        return QUANTIZERS[kind](codes=data["codes"], **params), int(data["store_version"]), segments
+
+
+def load_quantizer(store_path, manifest, n_rows):
+    """Load persisted codes if they match the current store, else None."""
+    persisted = _read_codes(store_path)
+    if persisted is None:
+        return None
+    quantizer, version, _ = persisted
+    if version != manifest["version"] or len(quantizer.codes) != n_rows:
+        print("⚠️ Quantized codes are stale — using float32 search (rebuild with `python quantization.py`)")
+        return None
+    return quantizer
+
+
+def build_for_store(store_path, kind="pq"):
+    from vector_store import load_store, segment_names, store_lock
+
+    with store_lock(store_path):
+        vectors, _, manifest = load_store(store_path)
+        quantizer = QUANTIZERS[kind].train(vectors)
+        quantizer.codes = quantizer.encode(vectors)
+        save_quantizer(store_path, quantizer, manifest["version"], segment_names(manifest))
+    return quantizer
+
+
+def update_for_store(store_path, kind, retrain=False):
+    """Bring the persisted codes up to the current store version.
+
+    If the store only gained segments since the codes were saved, the new
+    rows are encoded with the existing scale / codebooks; otherwise (or
+    with `retrain`) the quantizer is trained from scratch. Returns
+    (quantizer, rows added), with rows added None after retraining.
+    """
+    from vector_store import load_store, only_appended, segment_names, store_lock
+
+    with store_lock(store_path):
+        persisted = None if retrain else _read_codes(store_path)
+        vectors, _, manifest = load_store(store_path)
+        if persisted is None or persisted[0].kind != kind or \
+                not only_appended(manifest, persisted[2], len(persisted[0].codes)):
+            return build_for_store(store_path, kind), None
+        quantizer = persisted[0]
+        added = quantizer.encode(vectors, first=len(quantizer.codes))
+        quantizer.codes = np.concatenate([quantizer.codes, added])
+        save_quantizer(store_path, quantizer, manifest["version"], segment_names(manifest))
+    return quantizer, len(added)
+
+
+def stored_kind(store_path):
+    path = os.path.join(store_path, CODES_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return str(data["kind"])
+
+
+if __name__ == "__main__":
+    from vector_store import STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Build compressed codes for a vector store")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--kind", choices=sorted(QUANTIZERS), default="pq")
+    args = parser.parse_args()
+    quantizer = build_for_store(args.store, args.kind)
+    per_row = quantizer.codes.nbytes // max(len(quantizer.codes), 1)
+    print(f"✅ Built {args.kind} codes: {len(quantizer.codes)} rows, {per_row} bytes/row ({args.store}/{CODES_FILE})")
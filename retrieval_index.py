@@ -0,0 +1,295 @@
+import numpy as np
+
+from metadata_index import FILTER_KEYS, MetadataIndex
+
+
+# ============================================================
+# 🧮 Vector Helpers
+# ============================================================
+def normalize_rows(matrix):
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+SCORE_BLOCK = 65536  # corpus rows per GEMM step in batched search
+
+
+def top_k_indices(scores, top_k):
+    # argpartition is O(n); only the k winners get fully sorted
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+class SegmentedMatrix:
+    """Row-wise concatenation of segment matrices that never copies them.
+
+    Each block is kept as given (a read-only mmap for store segments), so
+    the OS page cache stays shared between processes whatever the number
+    of segments. Row ids are physical: `starts[s]` is segment s's first
+    row. `live` (bool per row, or None) marks rows that are not deleted;
+    scores() gives dead rows -inf so they never win a top-k.
+    """
+
+    dtype = np.dtype(np.float32)
+    ndim = 2
+
+    def __init__(self, blocks, dim=None, live=None):
+        self.blocks = [b for b in blocks if len(b)]
+        self.starts = np.zeros(len(self.blocks) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in self.blocks], out=self.starts[1:])
+        self.dim = int(dim if dim is not None else (self.blocks[0].shape[1] if self.blocks else 0))
+        self.live = live
+
+    @property
+    def shape(self):
+        return int(self.starts[-1]), self.dim
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def block_ranges(self, size):
+        """Yield (start, rows) pieces of at most `size` rows, never crossing a segment."""
+        for s, block in enumerate(self.blocks):
+            for offset in range(0, len(block), size):
+                yield int(self.starts[s]) + offset, block[offset:offset + size]
+
+    def take(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        segment = np.searchsorted(self.starts, rows, "right") - 1
+        for s in np.unique(segment):
+            mask = segment == s
+            out[mask] = self.blocks[s][rows[mask] - self.starts[s]]
+        return out
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            key = np.asarray(key)
+            return self.take(np.flatnonzero(key) if key.dtype == bool else key)
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            return self.take(np.arange(start, stop, step))
+        if start >= stop:
+            return np.empty((0, self.dim), dtype=np.float32)
+        s = int(np.searchsorted(self.starts, start, "right")) - 1
+        if stop <= self.starts[s + 1]:
+            return self.blocks[s][start - self.starts[s]:stop - self.starts[s]]
+        return self.take(np.arange(start, stop))
+
+    def __matmul__(self, other):
+        if not self.blocks:
+            return np.empty((0,) + np.shape(other)[1:], dtype=np.float32)
+        return np.concatenate([block @ other for block in self.blocks])
+
+    def scores(self, query):
+        scores = self @ query
+        if self.live is not None:
+            scores[~self.live] = -np.inf
+        return scores
+
+
+# ============================================================
+# 📚 Retrieval Index
+# ============================================================
+class RetrievalIndex:
+    """Corpus embeddings held as L2-normalized float32 segment matrices.
+
+    Store segments stay memory-mapped (see SegmentedMatrix); a query
+    costs one matrix-vector product per segment plus an argpartition
+    top-k. Row ids are physical store rows, deleted ones included, and
+    are kept out of every result through the live mask.
+    """
+
+    def __init__(self, embeddings, texts, normalized=False, meta=None, ann=None, quantizer=None,
+                 version=None, lexical=None):
+        if isinstance(embeddings, SegmentedMatrix):
+            self.matrix = embeddings
+        else:
+            matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+            if matrix.ndim != 2:
+                matrix = matrix.reshape(len(texts), -1)
+            self.matrix = SegmentedMatrix([matrix if normalized else normalize_rows(matrix)], matrix.shape[1])
+        self.texts = list(texts)
+        self.meta = meta or {"text": self.texts}
+        # Bool per row (False = deleted in the store), or None when every row is live
+        self.live = self.matrix.live
+        self.n_live = len(self.texts) if self.live is None else int(self.live.sum())
+        # Optional approximate index (see ann_index.IVFIndex); None = exact
+        self.ann = ann
+        # Optional compressed codes (see quantization.py) for the flat scan
+        self.quantizer = quantizer
+        # Store version this index was loaded from (None for joblib)
+        self.version = version
+        # Optional BM25 inverted index (see lexical_index.py) for hybrid search
+        self.lexical = lexical
+        # Row-id posting lists by video number / title for filtered search
+        self.metadata = MetadataIndex.from_meta(self.meta)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        from lexical_index import BM25Index
+
+        if len(df) == 0:
+            return cls(np.empty((0, 0), dtype=np.float32), [])
+        meta = {c: df[c].tolist() for c in ("chunk_id", "number", "title", "text") if c in df.columns}
+        texts = df["text"].tolist()
+        return cls(np.vstack(df["embedding"].to_numpy()), texts, meta=meta,
+                   lexical=BM25Index.build(texts))
+
+    @classmethod
+    def from_store(cls, path):
+        from ann_index import load_ann
+        from lexical_index import load_lexical
+        from quantization import load_quantizer
+        from vector_store import load_store
+
+        # Store vectors are already normalized, so the segment mmaps are used as-is.
+        # Side indexes cover physical rows (deleted ones too), hence len(vectors)
+        vectors, meta, manifest = load_store(path)
+        ann = load_ann(path, manifest, len(vectors))
+        quantizer = load_quantizer(path, manifest, len(vectors))
+        lexical = load_lexical(path, manifest, meta["text"])
+        return cls(vectors, meta["text"], normalized=True, meta=meta, ann=ann, quantizer=quantizer,
+                   version=manifest["version"], lexical=lexical)
+
+    def __len__(self):
+        return self.n_live
+
+    def filter_rows(self, filters):
+        """Sorted live row ids matching `filters` (number_min/number_max/title),
+        or None when no filter is given."""
+        filters = {k: v for k, v in (filters or {}).items() if k in FILTER_KEYS and v not in (None, "")}
+        if not filters:
+            return None
+        if self.metadata is None:
+            return np.empty(0, dtype=np.int64)
+        rows = self.metadata.rows(**filters)
+        return rows if self.live is None else rows[self.live[rows]]
+
+    def search(self, query_embedding, top_k=5, nprobe=None, exact=False, rows=None):
+        """Top-k (row ids, scores); `rows` restricts scoring to those row ids."""
+        if len(self) == 0 or (rows is not None and len(rows) == 0):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        if rows is not None:
+            # Filtered: gather just the matching rows and score them exactly
+            scores = self.matrix[rows] @ query
+            idx = top_k_indices(scores, top_k)
+            return rows[idx], scores[idx]
+        if self.ann is not None and not exact:
+            return self.ann.search(self.matrix, query, top_k, nprobe, live=self.live)
+        if self.quantizer is not None and not exact:
+            from quantization import search_quantized
+
+            return search_quantized(self.quantizer, self.matrix, query, top_k, live=self.live)
+        scores = self.matrix.scores(query)
+        idx = top_k_indices(scores, min(top_k, len(self)))
+        return idx, scores[idx]
+
+    def search_batch(self, query_embeddings, top_k=5, rows=None):
+        """Exact top-k for many queries in one pass over the corpus.
+
+        Each block of corpus rows is scored against all queries with one
+        matrix-matrix product, and a running (n_queries, top_k) winner set
+        is merged per block, so the corpus is read once for the whole batch.
+        Blocks never cross a segment, so no segment is copied.
+        Returns (idx, scores), both shaped (n_queries, k).
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        if rows is None:
+            matrix, live, k = self.matrix, self.live, min(top_k, len(self))
+        else:
+            matrix, live, k = SegmentedMatrix([self.matrix[rows]], self.matrix.dim), None, min(top_k, len(rows))
+        best_idx = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        if k <= 0:
+            return best_idx, best_scores
+        for start, corpus in matrix.block_ranges(SCORE_BLOCK):
+            block = queries @ corpus.T
+            if live is not None:
+                block[:, ~live[start:start + len(corpus)]] = -np.inf
+            kb = min(k, block.shape[1])
+            part = np.argpartition(-block, kb - 1, axis=1)[:, :kb]
+            cand_idx = np.concatenate([best_idx, part + start], axis=1)
+            cand_scores = np.concatenate([best_scores, np.take_along_axis(block, part, axis=1)], axis=1)
+            keep = np.argsort(-cand_scores, axis=1, kind="stable")[:, :k]
+            best_idx = np.take_along_axis(cand_idx, keep, axis=1)
+            best_scores = np.take_along_axis(cand_scores, keep, axis=1)
+        if rows is not None:
+            best_idx = rows[best_idx]
+        return best_idx, best_scores
+
+    def top_chunks(self, query_embedding, top_k=5, nprobe=None, rows=None):
+        idx, scores = self.search(query_embedding, top_k, nprobe, rows=rows)
+        if len(idx) == 0:
+            return [], 0.0
+        return [self.texts[i] for i in idx], float(scores[0])
+
+    def row(self, i, score=None):
+        row = {c: values[i] for c, values in self.meta.items()}
+        row.setdefault("text", self.texts[i])
+        row["score"] = None if score is None else float(score)
+        return row
+
+    def top_rows(self, query_embedding, top_k=5, nprobe=None, rows=None):
+        """Like top_chunks, but each hit is a metadata dict with its score."""
+        idx, scores = self.search(query_embedding, top_k, nprobe, rows=rows)
+        return [self.row(i, s) for i, s in zip(idx, scores)]
+
+    def top_rows_batch(self, query_embeddings, top_k=5, rows=None):
+        """One list of row dicts per query (see search_batch)."""
+        if len(self) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        idx, scores = self.search_batch(query_embeddings, top_k, rows)
+        return [[self.row(i, s) for i, s in zip(qi, qs)] for qi, qs in zip(idx, scores)]
+
+    def lexical_rows(self, query_text, top_k=5, rows=None):
+        """BM25-only hits, plus whether the match is strong enough to answer
+        without embedding the query. Returns (rows, strong)."""
+        from lexical_index import is_strong
+
+        if self.lexical is None or len(self) == 0:
+            return [], False
+        idx, scores, coverage, margin = self.lexical.search(query_text, top_k, allowed=rows, live=self.live)
+        return [self.row(i, s) for i, s in zip(idx, scores)], is_strong(coverage, margin)
+
+    def hybrid_rows(self, query_text, query_embedding, top_k=5, nprobe=None, candidates=None, rows=None):
+        """Fuse dense and BM25 rankings with reciprocal rank fusion.
+
+        Each row's "score" is its fused score and "similarity" its cosine
+        similarity to the query. Returns (rows, lexical_coverage).
+        """
+        from lexical_index import HYBRID_CANDIDATES, reciprocal_rank_fusion
+
+        candidates = max(candidates or HYBRID_CANDIDATES, top_k)
+        dense_idx, _ = self.search(query_embedding, candidates, nprobe, rows=rows)
+        if self.lexical is None:
+            lexical_idx, coverage = [], 0.0
+        else:
+            lexical_idx, _, coverage, _ = self.lexical.search(query_text, candidates, allowed=rows, live=self.live)
+        fused = reciprocal_rank_fusion([dense_idx, lexical_idx])[:top_k]
+        if not fused:
+            return [], coverage
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32))
+        similarity = self.matrix[[i for i, _ in fused]] @ query
+        rows = []
+        for (i, score), sim in zip(fused, similarity):
+            row = self.row(i, score)
+            row["similarity"] = float(sim)
+            rows.append(row)
+        return rows, coverage
+
+
+def retrieve_batch(index, questions, top_k=5, model=None, filters=None):
+    """Embed `questions` in one batch and return their top rows (one GEMM pass)."""
+    from embedding_client import EMBED_MODEL, get_client
+
+    if not questions:
+        return []
+    vectors = get_client(model or EMBED_MODEL).embed_many(list(questions))
+    return index.top_rows_batch(vectors, top_k, index.filter_rows(filters))
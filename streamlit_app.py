@@ -1,8 +1,8 @@
 import streamlit as st
 import requests
-import time
 import json
 import os
+import uuid
 
 # =========================================
 # 🌐 API Configuration
@@ -30,6 +30,10 @@ def save_chats(chats):
     with open(CHAT_FILE, "w", encoding="utf-8") as f:
         json.dump(chats, f, ensure_ascii=False, indent=4)
 
+def busy_message(message, retry_after):
+    message = message or "The model is busy, please retry shortly."
+    return f"⏳ {message} (retry in {retry_after}s)" if retry_after else f"⏳ {message}"
+
 # =========================================
 # 🎨 Page Setup
 # =========================================
@@ -116,6 +120,9 @@ if "current_chat_title" not in st.session_state:
     st.session_state.current_chat_title = "New Chat"
 if "search_query" not in st.session_state:
     st.session_state.search_query = ""
+if "session_id" not in st.session_state:
+    # Server-side memory is scoped to this id (one per chat)
+    st.session_state.session_id = uuid.uuid4().hex
 
 # =========================================
 # 🧭 Sidebar Controls (ChatGPT Style)
@@ -130,11 +137,13 @@ with st.sidebar:
             chat_title = first_message[:40] + "..." if len(first_message) > 40 else first_message
             st.session_state.saved_chats.append({
                 "title": chat_title,
-                "messages": st.session_state.chat_history
+                "messages": st.session_state.chat_history,
+                "session_id": st.session_state.session_id
             })
             save_chats(st.session_state.saved_chats)
         st.session_state.chat_history = []
         st.session_state.current_chat_title = "New Chat"
+        st.session_state.session_id = uuid.uuid4().hex
         st.rerun()
 
     # 🔍 Search Chat
@@ -154,6 +163,7 @@ with st.sidebar:
             if st.button(chat["title"], key=f"chat_{i}", use_container_width=True):
                 st.session_state.chat_history = chat["messages"]
                 st.session_state.current_chat_title = chat["title"]
+                st.session_state.session_id = chat.get("session_id") or uuid.uuid4().hex
                 st.rerun()
     else:
         st.caption("No saved chats yet.")
@@ -163,7 +173,7 @@ with st.sidebar:
     # 🧹 Clear Server Memory
     if st.button("🧹 Clear Memory (Server)"):
         try:
-            res = requests.post(f"{API_BASE}/clear")
+            res = requests.post(f"{API_BASE}/clear", headers={"X-Session-Id": st.session_state.session_id})
             if res.status_code == 200:
                 st.session_state.chat_history = []
                 st.success("✅ Server memory cleared!")
@@ -207,25 +217,37 @@ if user_input:
     st.session_state.chat_history.append({"role": "user", "content": user_input})
     st.markdown(f"<div class='user-bubble'>{user_input}</div>", unsafe_allow_html=True)
 
-    # API Call
-    with st.spinner("🤖 Thinking..."):
-        try:
-            response = requests.post(f"{API_BASE}/chat", json={"question": user_input})
+    # API Call (tokens are rendered as the server streams them)
+    placeholder = st.empty()
+    placeholder.markdown("<div class='bot-bubble'><span class='typing'></span></div>", unsafe_allow_html=True)
+    answer = ""
+    try:
+        with requests.post(f"{API_BASE}/chat/stream", json={"question": user_input, "session_id": st.session_state.session_id}, stream=True) as response:
             if response.status_code == 200:
-                data = response.json()
-                answer = data.get("answer", "⚠️ No response received.")
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[len("data: "):])
+                    if "token" in event:
+                        answer += event["token"]
+                        placeholder.markdown(f"<div class='bot-bubble'>{answer}<span class='typing'></span></div>", unsafe_allow_html=True)
+                    elif "error" in event:
+                        # Queued too long on the server: say so instead of "no response"
+                        answer = busy_message(event["error"], event.get("retry_after"))
+                        break
+                answer = answer.strip() or "⚠️ No response received."
+            elif response.status_code in (429, 503):
+                # Overloaded: the server refused up front and says when to come back
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                retry_after = response.headers.get("Retry-After") or body.get("retry_after")
+                answer = busy_message(body.get("error"), retry_after)
             else:
                 answer = f"❌ API Error {response.status_code}"
-        except Exception as e:
-            answer = f"🚫 Connection error: {e}"
-
-    # Typing effect
-    placeholder = st.empty()
-    full_text = ""
-    for char in answer:
-        full_text += char
-        placeholder.markdown(f"<div class='bot-bubble'>{full_text}<span class='typing'></span></div>", unsafe_allow_html=True)
-        time.sleep(0.02)
+    except Exception as e:
+        answer = f"🚫 Connection error: {e}"
     placeholder.markdown(f"<div class='bot-bubble'>{answer}</div>", unsafe_allow_html=True)
 
     # Store bot response
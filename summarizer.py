@@ -0,0 +1,82 @@
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+from memory_store import KEEP_RECENT_TURNS, SUMMARIZE_AFTER_WORDS, format_turn
+
+
+# ============================================================
+# 🧩 Background Memory Summarizer
+# ============================================================
+class MemorySummarizer:
+    """Compacts session memory on a background task, off the request path.
+
+    Requests call `maybe_schedule()` after saving a turn; it only compares
+    the session's running word count with the threshold and enqueues the
+    session at most once. The worker folds the session's older turns
+    (all but the last few) into its rolling summary, one LLM call per job.
+    """
+
+    def __init__(self, memory_store, summarize, threshold=SUMMARIZE_AFTER_WORDS,
+                 keep_recent=KEEP_RECENT_TURNS):
+        self.memory_store = memory_store
+        self.summarize = summarize  # async (summary, turns_text) -> new summary
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.queue = asyncio.Queue()
+        self.pending = set()
+        self.completed = 0
+        self.failed = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def maybe_schedule(self, session_id):
+        if session_id in self.pending:
+            return False
+        words = await run_in_threadpool(self.memory_store.word_count, session_id)
+        if words <= self.threshold:
+            return False
+        self.pending.add(session_id)
+        self.queue.put_nowait(session_id)
+        return True
+
+    async def _run(self):
+        while True:
+            session_id = await self.queue.get()
+            try:
+                await self.compact(session_id)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Summarization Error ({session_id}): {e}")
+            finally:
+                self.pending.discard(session_id)
+                self.queue.task_done()
+
+    async def compact(self, session_id):
+        summary, upto, turns = await run_in_threadpool(
+            self.memory_store.turns_to_fold, session_id, self.keep_recent)
+        if not turns:
+            return False
+        new_summary = await self.summarize(summary, "".join(format_turn(q, a) for _, q, a, _ in turns))
+        if not new_summary or new_summary.startswith("⚠️"):
+            raise RuntimeError("LLM returned no summary")
+        folded_words = sum(words for *_, words in turns)
+        return await run_in_threadpool(
+            self.memory_store.fold_summary, session_id, new_summary, upto, turns[-1][0], folded_words)
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "pending": len(self.pending),
+                "completed": self.completed, "failed": self.failed}
@@ -0,0 +1,39 @@
+import asyncio
+
+from memory_store import MemoryStore
+from summarizer import MemorySummarizer
+
+
+def test_fold_after_clear_does_not_leak_into_new_session(tmp_path):
+    store = MemoryStore(str(tmp_path / "memory.sqlite3"))
+    for i in range(6):
+        store.append_turn("s", f"secret q{i}", f"secret a{i}")
+
+    async def summarize_while_cleared(summary, turns):
+        # /clear and a fresh turn land while the LLM is summarizing
+        store.clear("s")
+        store.append_turn("s", "new q", "new a")
+        return "SUMMARY OF SECRET CONVERSATION"
+
+    summarizer = MemorySummarizer(store, summarize_while_cleared, keep_recent=2)
+    assert asyncio.run(summarizer.compact("s")) is False
+
+    text, _ = store.load("s")
+    assert "SECRET" not in text
+    assert text == "User: new q\nAppsterGPT: new a"
+
+
+def test_fold_applies_when_session_untouched(tmp_path):
+    store = MemoryStore(str(tmp_path / "memory.sqlite3"))
+    for i in range(6):
+        store.append_turn("s", f"q{i}", f"a{i}")
+
+    async def summarize(summary, turns):
+        return "SUMMARY"
+
+    summarizer = MemorySummarizer(store, summarize, keep_recent=2)
+    assert asyncio.run(summarizer.compact("s")) is True
+
+    text, _ = store.load("s")
+    assert text.startswith("SUMMARY")
+    assert "q3" not in text and "q5" in text
@@ -0,0 +1,17 @@
+from prompt_builder import count_tokens, trim_memory
+
+
+def test_trim_memory_keeps_summary_containing_user_marker():
+    summary = "The User: asked about loops. " + "detail " * 400
+    turns = "".join(f"\nUser: q{i}\nAppsterGPT: " + "answer " * 50 + "\n" for i in range(10))
+    memory = trim_memory(summary, turns, 300)
+    assert count_tokens(memory) <= 300
+    assert memory.startswith("The User: asked about loops.")
+    assert memory.rstrip().endswith("answer")
+    assert "q9" in memory and "q0" not in memory
+
+
+def test_trim_memory_user_marker_in_turn_text():
+    turns = "\nUser: what does 'User:' mean?\nAppsterGPT: a label\n"
+    assert trim_memory("", turns, 300) == turns.strip()
+    assert trim_memory("S", turns, 300) == "S\n" + turns.strip()
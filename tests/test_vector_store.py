@@ -0,0 +1,31 @@
+import numpy as np
+
+import quantization
+from ann_index import MIN_ROWS_FOR_ANN, build_for_store, load_ann
+from lexical_index import BM25Index
+from vector_store import StoreWriter, compact_store, load_store, read_manifest
+
+
+def _meta(start, n):
+    return {"chunk_id": list(range(start, start + n)), "number": ["001"] * n,
+            "title": ["t"] * n, "text": [f"chunk {i}" for i in range(start, start + n)]}
+
+
+def test_compact_rebuilds_side_indexes(tmp_path):
+    path = str(tmp_path / "store")
+    rng = np.random.default_rng(0)
+    n = MIN_ROWS_FOR_ANN + 500
+    with StoreWriter(path, model="m", shard_rows=8192) as writer:
+        writer.append(rng.standard_normal((n, 16)), _meta(0, n))
+    build_for_store(path, n_lists=64)
+    quantization.build_for_store(path, "int8")
+    with StoreWriter(path, model="m", append=True) as writer:
+        writer.deleted.update(range(100))
+
+    assert compact_store(path) == n - 100
+    vectors, _, manifest = load_store(path)
+    assert len(vectors.blocks) == 1 and vectors.live is None
+    assert load_ann(path, manifest, len(vectors)) is not None
+    assert quantization.load_quantizer(path, manifest, len(vectors)) is not None
+    bm25 = BM25Index.load(path)
+    assert bm25.store_version == read_manifest(path)["version"] and bm25.n_rows == len(vectors)
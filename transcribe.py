@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ingest import JSON_FOLDER, extract_number
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+AUDIO_FOLDER = "audio"
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg")
+BACKEND = os.environ.get("TRANSCRIBE_BACKEND", "whisper")
+WHISPER_MODEL = "small"    # CPU-friendly; "large-v2" is better but far slower without a GPU
+LANGUAGE = None            # None = auto-detect (e.g. "hi" for Hindi lectures)
+TASK = "transcribe"        # or "translate" to get English text
+WORKERS = os.cpu_count() or 1
+
+
+# ============================================================
+# 🎙️ Speech-to-Text Backends
+# ============================================================
+class WhisperBackend:
+    """Local openai-whisper model, run on the CPU (one model per worker process)."""
+
+    name = "whisper"
+
+    def __init__(self, model=WHISPER_MODEL, language=LANGUAGE, task=TASK, threads=None):
+        import torch
+        import whisper
+
+        if threads:
+            # Workers share the cores instead of each spawning cpu_count threads
+            torch.set_num_threads(threads)
+        self.model = whisper.load_model(model, device="cpu")
+        self.language = language
+        self.task = task
+
+    def transcribe(self, audio_path):
+        result = self.model.transcribe(audio_path, language=self.language, task=self.task, fp16=False)
+        return [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]]
+
+
+class StubBackend:
+    """Deterministic fake transcripts (no model), for tests and dry runs.
+
+    If `<audio>.txt` exists next to the audio file, each of its lines
+    becomes one segment; otherwise a few placeholder segments are made.
+    """
+
+    name = "stub"
+
+    def __init__(self, segments=3, **_):
+        self.segments = segments
+
+    def transcribe(self, audio_path):
+        sidecar = os.path.splitext(audio_path)[0] + ".txt"
+        if os.path.exists(sidecar):
+            with open(sidecar, "r", encoding="utf-8") as f:
+                lines = [line.strip() for line in f if line.strip()]
+        else:
+            name = os.path.splitext(os.path.basename(audio_path))[0]
+            lines = [f"{name} segment {i}" for i in range(self.segments)]
+        return [{"start": float(i * 5), "end": float(i * 5 + 5), "text": line} for i, line in enumerate(lines)]
+
+
+BACKENDS = {b.name: b for b in (WhisperBackend, StubBackend)}
+
+
+# ============================================================
+# 📂 Audio Files → Chunk JSONs
+# ============================================================
+def parse_audio_name(filename):
+    """Split "12 - Intro to HTML.mp3" into ("12", "Intro to HTML"), as procees_video.py names files."""
+    stem = os.path.splitext(filename)[0]
+    number, sep, title = stem.partition(" - ")
+    if not sep:
+        match = re.search(r"\d+", stem)
+        return (match.group(0) if match else stem), stem
+    return number.strip(), title.strip()
+
+
+def list_audio_files(audio_folder):
+    files = [f for f in os.listdir(audio_folder) if f.lower().endswith(AUDIO_EXTENSIONS)]
+    return sorted(files, key=extract_number)
+
+
+def json_path_for(json_folder, filename):
+    return os.path.join(json_folder, os.path.splitext(filename)[0] + ".json")
+
+
+def source_signature(audio_path):
+    stat = os.stat(audio_path)
+    return {"file": os.path.basename(audio_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def is_done(audio_path, json_path):
+    """Checkpoint: a chunk JSON exists and was made from this exact audio file."""
+    if not os.path.exists(json_path):
+        return False
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("source") == source_signature(audio_path)
+    except (OSError, ValueError):
+        return False  # half-written or corrupt output is redone
+
+
+def build_chunks(segments, number, title):
+    chunks = []
+    for segment in segments:
+        text = segment["text"].strip()
+        if text:
+            chunks.append({"number": number, "title": title, "start": segment["start"],
+                           "end": segment["end"], "text": text})
+    return chunks
+
+
+def write_json(path, content):
+    # Write-then-rename so a crash never leaves a truncated JSON behind
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(content, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+# --------------------------
+# 👷 Worker Process
+# --------------------------
+_backend = None
+
+
+def _init_worker(backend, options):
+    global _backend
+    _backend = BACKENDS[backend](**options)
+
+
+def _transcribe_file(audio_path, json_path):
+    started = time.perf_counter()
+    number, title = parse_audio_name(os.path.basename(audio_path))
+    chunks = build_chunks(_backend.transcribe(audio_path), number, title)
+    write_json(json_path, {
+        "video_number": number,
+        "title": title,
+        "source": source_signature(audio_path),
+        "chunks": chunks,
+        "text": " ".join(c["text"] for c in chunks),
+    })
+    return len(chunks), time.perf_counter() - started
+
+
+def transcribe_folder(audio_folder=AUDIO_FOLDER, json_folder=JSON_FOLDER, backend=BACKEND,
+                      workers=WORKERS, force=False, **options):
+    """Transcribe every audio file that has no up-to-date chunk JSON yet.
+
+    Files are spread over a process pool; each finished file is written
+    atomically, so after a crash a rerun picks up where it stopped.
+    Returns (transcribed, skipped, failed) file counts.
+    """
+    os.makedirs(json_folder, exist_ok=True)
+    todo, skipped = [], 0
+    for filename in list_audio_files(audio_folder):
+        audio_path = os.path.join(audio_folder, filename)
+        json_path = json_path_for(json_folder, filename)
+        if not force and is_done(audio_path, json_path):
+            skipped += 1
+            continue
+        todo.append((audio_path, json_path))
+
+    print(f"🎙️ {len(todo)} files to transcribe, {skipped} already done ({backend}, {workers} workers)")
+    if not todo:
+        return 0, skipped, 0
+
+    if backend == "whisper":
+        options.setdefault("threads", max(1, (os.cpu_count() or 1) // workers))
+    started = time.perf_counter()
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo)), initializer=_init_worker,
+                             initargs=(backend, options)) as pool:
+        futures = {pool.submit(_transcribe_file, a, j): a for a, j in todo}
+        for future in as_completed(futures):
+            name = os.path.basename(futures[future])
+            try:
+                n_chunks, seconds = future.result()
+                done += 1
+                print(f"✅ [{done + failed}/{len(todo)}] {name}: {n_chunks} chunks in {seconds:.1f}s")
+            except Exception as e:
+                failed += 1
+                print(f"❌ Transcription Error ({name}): {e}")
+
+    elapsed = time.perf_counter() - started
+    print(f"📋 Transcribed {done} files in {elapsed:.1f}s, {skipped} skipped, {failed} failed")
+    return done, skipped, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe audio/ into chunk JSONs for ingest.py")
+    parser.add_argument("--audio", default=AUDIO_FOLDER)
+    parser.add_argument("--jsons", default=JSON_FOLDER)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--model", default=WHISPER_MODEL, help="whisper model name")
+    parser.add_argument("--language", default=LANGUAGE)
+    parser.add_argument("--task", choices=["transcribe", "translate"], default=TASK)
+    parser.add_argument("--force", action="store_true", help="redo files that are already transcribed")
+    args = parser.parse_args()
+    options = {"model": args.model, "language": args.language, "task": args.task} \
+        if args.backend == "whisper" else {}
+    transcribe_folder(args.audio, args.jsons, args.backend, args.workers, args.force, **options)
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+
+from ingest import BATCH_SIZE, CONCURRENCY, embed_batches, iter_file_chunks, update_side_indexes, video_number_for
+from vector_store import META_COLUMNS, STORE_DIR, StoreWriter, read_manifest, store_exists, store_lock
+
+# ============================================================
+# ⚙️ Configuration
+# ============================================================
+UPLOAD_FOLDER = "uploads"
+UPLOAD_EXTENSIONS = (".txt", ".md", ".markdown", ".pdf", ".json")
+UPLOAD_READ_BYTES = 1024 * 1024        # streamed to disk this much at a time
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+CHUNK_WORDS = 200                      # words per chunk for plain text / PDF
+CHUNK_OVERLAP = 40                     # words repeated at the start of the next chunk
+MAX_JOBS = 200                         # finished jobs kept for the status endpoint
+
+
+def safe_filename(filename):
+    name = os.path.basename(filename or "").strip()
+    name = re.sub(r"[^\w.\- ]", "_", name)
+    return name or "upload"
+
+
+def is_supported(filename):
+    return filename.lower().endswith(UPLOAD_EXTENSIONS)
+
+
+# ============================================================
+# 📄 Text Extraction (txt / md / pdf / transcript JSON)
+# ============================================================
+def iter_text_words(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            yield from line.split()
+
+
+def iter_pdf_words(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF uploads need the pypdf package (pip install pypdf)")
+    for page in PdfReader(path).pages:
+        yield from (page.extract_text() or "").split()
+
+
+def window_chunks(words, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Group a word stream into overlapping chunks of `size` words."""
+    step = max(1, size - overlap)
+    window, emitted = [], False
+    for word in words:
+        window.append(word)
+        if len(window) == size:
+            yield " ".join(window)
+            window, emitted = window[step:], True
+    # The carried-over overlap alone is not a new chunk
+    if len(window) > (size - step if emitted else 0):
+        yield " ".join(window)
+
+
+def extract_chunks(path, filename):
+    """Yield {"text", "title", "number"} chunks for one uploaded file.
+
+    Transcript JSONs (transcribe.py / jsons/ format) keep their own
+    chunks; other files are split into CHUNK_WORDS-word windows, read a
+    line or a page at a time.
+    """
+    stem, ext = os.path.splitext(filename)
+    ext = ext.lower()
+    if ext == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        if not isinstance(content, dict) or "chunks" not in content:
+            raise ValueError("JSON uploads must be transcripts with a 'chunks' list")
+        yield from iter_file_chunks(content, video_number_for(content, filename))
+        return
+
+    words = iter_pdf_words(path) if ext == ".pdf" else iter_text_words(path)
+    number = video_number_for({}, filename)
+    for text in window_chunks(words):
+        yield {"text": text, "title": stem, "number": number}
+
+
+# ============================================================
+# 📤 Upload Jobs
+# ============================================================
+class UploadJob:
+    def __init__(self, filename, folder=UPLOAD_FOLDER):
+        self.id = uuid.uuid4().hex[:12]
+        self.filename = safe_filename(filename)
+        # Prefixed with the job id so two uploads of the same name never collide
+        self.path = os.path.join(folder, f"{self.id}-{self.filename}")
+        self.size = 0
+        self.status = "queued"   # queued → extracting → indexing → done | failed
+        self.chunks = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.index_version = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "bytes": self.size,
+            "status": self.status,
+            "chunks_embedded": self.chunks,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "index_version": self.index_version,
+            "error": self.error,
+        }
+
+
+class UploadIndexer:
+    """Background worker that turns uploaded files into index rows.
+
+    Jobs are handled one at a time, and each holds store_lock() from
+    reading the manifest to updating the side indexes, so uploads in
+    other uvicorn workers and ingest.py runs wait their turn. Each
+    job streams its chunks through ingest.embed_batches() into a
+    StoreWriter opened with append=True, so a file of any size is never
+    held in memory, and nothing is visible until the manifest commit.
+    After the commit the new rows are added to the side indexes and `on_commit()`
+    (e.g. IndexManager.reload) swaps the new version in.
+
+    Uploaded rows have no entry in the ingest manifest, so incremental
+    ingest.py runs keep them, while `ingest.py --full` rebuilds without them.
+    """
+
+    def __init__(self, embed_many, on_commit=None, store_path=STORE_DIR, model="bge-m3",
+                 batch_size=BATCH_SIZE, concurrency=CONCURRENCY, max_jobs=MAX_JOBS):
+        self.embed_many = embed_many
+        self.on_commit = on_commit  # async () -> None
+        self.store_path = store_path
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.queue = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def submit(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status not in ("done", "failed"):
+                break
+            self.jobs.popitem(last=False)
+        self.queue.put_nowait(job)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    async def _run(self):
+        while True:
+            job = await self.queue.get()
+            job.started_at = time.time()
+            try:
+                job.index_version = await asyncio.to_thread(self.index_file, job)
+                if self.on_commit is not None:
+                    await self.on_commit()
+                job.status = "done"
+                print(f"✅ Indexed upload {job.filename} ({job.chunks} chunks)")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"❌ Upload Indexing Error ({job.filename}): {e}")
+            finally:
+                job.finished_at = time.time()
+                self.queue.task_done()
+
+    def index_file(self, job):
+        """Extract, embed and append one file (runs in a worker thread)."""
+        # Waits for ingest.py or another worker's upload to finish with the store
+        with store_lock(self.store_path):
+            return self._index_locked(job)
+
+    def _index_locked(self, job):
+        if store_exists(self.store_path) and read_manifest(self.store_path)["model"] != self.model:
+            raise RuntimeError(f"store was built with a different model than {self.model}")
+        job.status = "extracting"
+        with StoreWriter(self.store_path, model=self.model, append=True) as writer:
+            start_id = writer.next_chunk_id
+
+            def numbered():
+                for chunk_id, chunk in enumerate(extract_chunks(job.path, job.filename), start=start_id):
+                    chunk["chunk_id"] = chunk_id
+                    yield chunk
+
+            for batch, vectors in embed_batches(numbered(), self.embed_many, self.batch_size, self.concurrency):
+                job.status = "indexing"
+                writer.append(vectors, {c: [chunk.get(c) for chunk in batch] for c in META_COLUMNS})
+                job.chunks += len(batch)
+            if not job.chunks:
+                writer.cancel()
+                raise ValueError("no text could be extracted")
+        update_side_indexes(self.store_path)
+        return read_manifest(self.store_path)["version"]
+
+    def stats(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"queued": self.queue.qsize() if self.queue else 0, "jobs": counts}
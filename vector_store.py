@@ -0,0 +1,419 @@
+import fcntl
+import json
+import os
+import sys
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+
+import numpy as np
+
+from retrieval_index import SegmentedMatrix, normalize_rows
+
+# ============================================================
+# ⚙️ Store Layout
+# ============================================================
+# vector_store/
+#   manifest.json          -> commit point: segments, deleted chunk ids, version
+#   seg-00000.npy          -> float32 (rows, dim), L2-normalized, opened with mmap
+#   seg-00000.meta.json    -> column lists: chunk_id, number, title, text
+#   ingest-00003.json      -> per-file / per-chunk content hashes (see ingest.py)
+#   store.lock             -> flock'd by whoever is writing (see store_lock)
+#
+# Segments are immutable and at most SHARD_ROWS rows each. Appending
+# writes new segments and deleting records chunk ids in the manifest, so
+# neither rewrites existing vectors.
+STORE_DIR = "vector_store"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "store.lock"
+META_COLUMNS = ("chunk_id", "number", "title", "text")
+STORE_FORMAT = 2
+SHARD_ROWS = 65536         # rows per segment written by StoreWriter (256 MB at 1024-d)
+
+
+# ============================================================
+# 💾 Write
+# ============================================================
+def _replace_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+_held_locks = {}               # realpath -> [RLock, depth, locked file]
+_held_locks_guard = threading.Lock()
+
+
+@contextmanager
+def store_lock(path):
+    """Hold the store's writer lock for the duration of the block.
+
+    An exclusive fcntl.flock on store.lock serializes every writer across
+    processes (ingest.py, uploads in any uvicorn worker, compaction, side
+    index builds). Re-entrant within a thread, so a caller holding it can
+    still open a StoreWriter; other threads of the process wait.
+    """
+    key = os.path.realpath(path)
+    with _held_locks_guard:
+        entry = _held_locks.setdefault(key, [threading.RLock(), 0, None])
+    with entry[0]:
+        if entry[1] == 0:
+            os.makedirs(path, exist_ok=True)
+            f = open(os.path.join(path, LOCK_FILE), "a")
+            fcntl.flock(f, fcntl.LOCK_EX)
+            entry[2] = f
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                entry[2].close()  # closing the file drops the flock
+                entry[2] = None
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if "segments" not in manifest:
+        # Format 1: a single vectors.npy + meta.json pair
+        manifest["segments"] = [{"vectors": "vectors.npy", "meta": "meta.json", "count": manifest["count"]}]
+        manifest.setdefault("deleted", [])
+        manifest.setdefault("version", 0)
+        manifest.setdefault("next_segment", 0)
+        manifest.setdefault("next_chunk_id", manifest["count"])
+        manifest.setdefault("ingest", None)
+    return manifest
+
+
+class StoreWriter:
+    """Append vectors to a store in batches without holding them in memory.
+
+    Rows are normalized and streamed to a raw part file as they arrive.
+    Every `shard_rows` rows the part file is turned into a segment, so
+    the writer itself holds at most one shard's metadata
+    (shard_rows=None writes a single segment). Nothing is visible
+    to readers until close() commits by replacing the manifest. With
+    append=True the existing segments are kept; otherwise the new
+    segments replace them.
+
+    Before closing, callers may fill `deleted` with chunk ids to drop and
+    set `ingest_state` to persist ingestion bookkeeping with the commit.
+
+    The writer holds store_lock() from construction until close/cancel;
+    callers that read the store before writing (ingest, uploads) take the
+    lock first so what they read is still current at commit time.
+    """
+
+    COPY_ROWS = 8192
+
+    def __init__(self, path, model="bge-m3", append=False, shard_rows=SHARD_ROWS):
+        self.path = path
+        self.model = model
+        self.shard_rows = shard_rows
+        self.count = 0          # rows in the current (unwritten) shard
+        self.total = 0
+        self.new_segments = []
+        self.meta = {c: [] for c in META_COLUMNS}
+        self.deleted = set()
+        self.ingest_state = None
+        self._lock = ExitStack()
+        self._lock.enter_context(store_lock(path))
+        try:
+            # Version and segment numbers continue even on a full rewrite, so a
+            # new segment never overwrites one that a reader may have mapped
+            self.previous = read_manifest(path) if store_exists(path) else None
+            self.base = self.previous if append else None
+            self.dim = (self.base["dim"] or None) if self.base else None
+            self.next_chunk_id = self.base["next_chunk_id"] if self.base else 0
+            self.next_segment = self.previous["next_segment"] if self.previous else 0
+            self._part_path = os.path.join(path, f"segment-{uuid.uuid4().hex[:12]}.part")
+            self._part = open(self._part_path, "wb")
+        except BaseException:
+            self._lock.close()
+            raise
+        self._closed = False
+
+    def append(self, vectors, meta):
+        vectors = normalize_rows(vectors)
+        if len(vectors) == 0:
+            return
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-d vectors, got {vectors.shape[1]}-d")
+        columns = {c: meta.get(c, [None] * len(vectors)) for c in META_COLUMNS}
+        for column, values in columns.items():
+            if len(values) != len(vectors):
+                raise ValueError(f"meta column '{column}' has {len(values)} rows, expected {len(vectors)}")
+        ids = [c for c in meta.get("chunk_id", []) if isinstance(c, int)]
+        if ids:
+            self.next_chunk_id = max(self.next_chunk_id, max(ids) + 1)
+        start = 0
+        while start < len(vectors):
+            room = len(vectors) - start if not self.shard_rows else self.shard_rows - self.count
+            stop = min(len(vectors), start + room)
+            self._part.write(vectors[start:stop].tobytes())
+            for column, values in columns.items():
+                self.meta[column].extend(values[start:stop])
+            self.count += stop - start
+            self.total += stop - start
+            start = stop
+            if self.shard_rows and self.count >= self.shard_rows:
+                self._roll()
+
+    def _write_segment(self, name):
+        dim = self.dim or 0
+        vectors_file = f"{name}.npy"
+        out = np.lib.format.open_memmap(os.path.join(self.path, vectors_file), mode="w+",
+                                        dtype=np.float32, shape=(self.count, dim))
+        part = np.memmap(self._part_path, dtype=np.float32, mode="r", shape=(self.count, dim))
+        for start in range(0, self.count, self.COPY_ROWS):
+            out[start:start + self.COPY_ROWS] = part[start:start + self.COPY_ROWS]
+        out.flush()
+        del out, part
+        meta_file = f"{name}.meta.json"
+        _replace_json(os.path.join(self.path, meta_file), self.meta)
+        return {"vectors": vectors_file, "meta": meta_file, "count": self.count}
+
+    def _roll(self):
+        # Seal the current shard as a segment (not yet in the manifest) and start a new one
+        self._part.close()
+        if self.count:
+            self.new_segments.append(self._write_segment(f"seg-{self.next_segment:05d}"))
+            self.next_segment += 1
+        self._part = open(self._part_path, "wb")
+        self.count = 0
+        self.meta = {c: [] for c in META_COLUMNS}
+
+    def cancel(self):
+        """Drop everything appended so far and leave the store as it was."""
+        try:
+            self._part.close()
+            os.remove(self._part_path)
+            for segment in self.new_segments:
+                for name in (segment["vectors"], segment["meta"]):
+                    os.remove(os.path.join(self.path, name))
+            self.new_segments = []
+            self._closed = True
+        finally:
+            self._lock.close()
+
+    def close(self):
+        try:
+            return self._commit()
+        finally:
+            self._lock.close()
+
+    def _commit(self):
+        self._roll()
+        self._part.close()
+        self._closed = True
+        current = read_manifest(self.path) if store_exists(self.path) else None
+        if (current or {}).get("version") != (self.previous or {}).get("version"):
+            self.cancel()
+            raise RuntimeError(f"{self.path} was changed by another writer; nothing was committed")
+        base = self.base or {"segments": [], "deleted": []}
+        version = self.previous["version"] + 1 if self.previous else 1
+        segments = list(base["segments"]) + self.new_segments
+        os.remove(self._part_path)
+
+        deleted = sorted(set(base["deleted"]) | self.deleted)
+        ingest_file = base.get("ingest") if self.base else None
+        if self.ingest_state is not None:
+            ingest_file = f"ingest-{version:05d}.json"
+            _replace_json(os.path.join(self.path, ingest_file), self.ingest_state)
+
+        # Manifest goes last so a reader never sees it ahead of its data
+        _replace_json(os.path.join(self.path, MANIFEST_FILE), {
+            "format": STORE_FORMAT,
+            "version": version,
+            "count": sum(s["count"] for s in segments) - len(deleted),
+            "dim": self.dim or 0,
+            "model": self.model,
+            "normalized": True,
+            "segments": segments,
+            "deleted": deleted,
+            "next_segment": self.next_segment,
+            "next_chunk_id": self.next_chunk_id,
+            "ingest": ingest_file,
+        })
+        _remove_unreferenced(self.path, segments, ingest_file)
+        return self.total
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._closed:
+            return
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave the previous store untouched on failure
+            self.cancel()
+
+
+def _remove_unreferenced(path, segments, ingest_file):
+    keep = {MANIFEST_FILE, ingest_file}
+    for segment in segments:
+        keep.update((segment["vectors"], segment["meta"]))
+    for name in os.listdir(path):
+        # Only one writer holds the lock, so any other part file is left from a crash
+        stale = name.startswith(("seg-", "ingest-")) or name in ("vectors.npy", "meta.json") or \
+            (name.startswith("segment") and name.endswith(".part"))
+        if stale and name not in keep:
+            os.remove(os.path.join(path, name))
+
+
+def save_store(path, vectors, meta, model="bge-m3"):
+    with StoreWriter(path, model=model) as writer:
+        writer.append(vectors, meta)
+
+
+# ============================================================
+# 📂 Read
+# ============================================================
+def store_exists(path):
+    return os.path.exists(os.path.join(path, MANIFEST_FILE))
+
+
+def load_ingest_state(path):
+    manifest = read_manifest(path)
+    if not manifest.get("ingest"):
+        return None
+    with open(os.path.join(path, manifest["ingest"]), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_meta(path, segments, columns=META_COLUMNS):
+    """Metadata columns of `segments` (manifest entries), without opening any vectors."""
+    meta = {c: [] for c in columns}
+    for segment in segments:
+        if not segment["count"]:
+            continue
+        with open(os.path.join(path, segment["meta"]), "r", encoding="utf-8") as f:
+            segment_meta = json.load(f)
+        for c in columns:
+            meta[c].extend(segment_meta.get(c, [None] * segment["count"]))
+    return meta
+
+
+def segment_names(manifest):
+    return [s["vectors"] for s in manifest["segments"]]
+
+
+def only_appended(manifest, segments, n_rows):
+    """Whether a side index built over `segments` (n_rows rows) still holds.
+
+    Segments are immutable and their names never reused, so if they are a
+    prefix of the store's current segments, rows 0..n_rows are unchanged
+    and everything after them was appended since.
+    """
+    if segments is None or segment_names(manifest)[:len(segments)] != list(segments):
+        return False
+    return sum(s["count"] for s in manifest["segments"][:len(segments)]) == n_rows
+
+
+def load_store(path):
+    """Open a store without reading the vectors into RAM.
+
+    Every segment comes back as its own read-only memory map inside one
+    SegmentedMatrix, so the OS page cache is shared between every process
+    (e.g. uvicorn workers) that opens it, however many segments there are.
+    Row ids are physical: `meta` lists cover every segment row and deleted
+    rows are only masked out by `vectors.live`; compact_store() drops them.
+    """
+    manifest = read_manifest(path)
+    blocks = []
+    for segment in manifest["segments"]:
+        if not segment["count"]:
+            continue  # an empty array cannot be memory-mapped
+        vectors = np.load(os.path.join(path, segment["vectors"]), mmap_mode="r")
+        if len(vectors) != segment["count"]:
+            raise ValueError(f"segment {segment['vectors']} is incomplete ({len(vectors)}/{segment['count']} vectors)")
+        blocks.append(vectors)
+    meta = load_meta(path, manifest["segments"])
+
+    live = None
+    deleted = set(manifest["deleted"])
+    if deleted:
+        live = np.fromiter((cid not in deleted for cid in meta["chunk_id"]), dtype=bool,
+                           count=len(meta["chunk_id"]))
+    return SegmentedMatrix(blocks, manifest["dim"], live), meta, manifest
+
+
+# ============================================================
+# 🧹 Compact
+# ============================================================
+def compact_store(path):
+    """Merge all segments into one and physically drop deleted rows.
+
+    Row ids change, so the side indexes (BM25, and IVF / codes if present)
+    are rebuilt for the new version before the lock is released.
+    """
+    from ingest import update_side_indexes
+
+    with store_lock(path):
+        written = _compact_locked(path)
+        update_side_indexes(path, retrain=True)
+    return written
+
+
+def _compact_locked(path):
+    vectors, meta, manifest = load_store(path)
+    ingest_state = load_ingest_state(path)
+    written = 0
+    with StoreWriter(path, model=manifest["model"], shard_rows=None) as writer:
+        writer.next_chunk_id = manifest["next_chunk_id"]
+        writer.ingest_state = ingest_state
+        for start, block in vectors.block_ranges(StoreWriter.COPY_ROWS):
+            stop = start + len(block)
+            keep = np.ones(len(block), dtype=bool) if vectors.live is None else vectors.live[start:stop]
+            rows = np.flatnonzero(keep)
+            writer.append(block[rows], {c: [meta[c][start + i] for i in rows] for c in META_COLUMNS})
+            written += len(rows)
+    return written
+
+
+# ============================================================
+# 🔁 Convert from embeddings.joblib
+# ============================================================
+def _json_value(value):
+    # numpy scalars / NaN from pandas are not JSON-serializable as-is
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def convert_joblib(joblib_path, store_path):
+    import joblib
+
+    df = joblib.load(joblib_path)
+    if len(df):
+        vectors = np.vstack(df["embedding"].to_numpy()).astype(np.float32)
+    else:
+        vectors = np.empty((0, 0), dtype=np.float32)
+    meta = {
+        c: [_json_value(v) for v in df[c]] if c in df.columns else [None] * len(df)
+        for c in META_COLUMNS
+    }
+    if "chunk_id" not in df.columns:
+        meta["chunk_id"] = list(range(len(df)))
+    save_store(store_path, vectors, meta)
+    return len(df)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        dst = sys.argv[2] if len(sys.argv) > 2 else STORE_DIR
+        count = compact_store(dst)
+        print(f"✅ Compacted {dst}/ to one segment ({count} chunks)")
+    else:
+        src = sys.argv[1] if len(sys.argv) > 1 else "embeddings.joblib"
+        dst = sys.argv[2] if len(sys.argv) > 2 else STORE_DIR
+        count = convert_joblib(src, dst)
+        print(f"✅ Converted {count} chunks from {src} to {dst}/")